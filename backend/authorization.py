@@ -0,0 +1,112 @@
+"""Group membership and role checks shared by the routers.
+
+``get_group_membership`` resolves the group, its members and the caller's role
+with one query. FastAPI reuses the result for the rest of the request, and
+``group_access_cache`` keeps it briefly across requests and workers, tagged
+with the group's ledger version. Each request reads the current version and
+treats an entry from an older one as a miss, so a stale entry is never served,
+even while an invalidation is still on its way from another worker or raced
+the load that cached it. Anything that writes a group's row or its members
+must bump the version in the same DB transaction, and should call
+``invalidate_group_access`` once the write has committed to free the entry.
+"""
+import os
+from typing import Dict
+from fastapi import Depends, HTTPException
+from sqlalchemy import select
+from backplane import SharedCache
+from database import database
+from etags import get_group_version
+from models import User, UserRole, groups, members
+from security import get_current_user
+
+GROUP_ACCESS_CACHE_SIZE = int(os.getenv("GROUP_ACCESS_CACHE_SIZE", "4096"))
+GROUP_ACCESS_CACHE_TTL_SECONDS = float(os.getenv("GROUP_ACCESS_CACHE_TTL_SECONDS", "30"))
+
+group_access_cache = SharedCache("group_access", maxsize=GROUP_ACCESS_CACHE_SIZE, ttl=GROUP_ACCESS_CACHE_TTL_SECONDS)
+
+# Roles allowed to record transactions, and to edit or delete them
+TRANSACTION_CREATOR_ROLES = (UserRole.OWNER, UserRole.ADMIN, UserRole.EDITOR, UserRole.CONTRIBUTOR)
+TRANSACTION_EDITOR_ROLES = (UserRole.OWNER, UserRole.ADMIN, UserRole.EDITOR)
+
+class GroupAccess:
+    """A group's row and its member rows keyed by user ID, as of ledger ``version``."""
+
+    def __init__(self, group: dict, group_members: Dict[str, dict], version: int):
+        self.group = group
+        self.members = group_members
+        self.version = version
+
+    def active_members(self):
+        return [member for member in self.members.values() if member["isActive"]]
+
+class GroupMembership:
+    """The group being accessed and the caller's member row in it.
+
+    ``version`` is the ledger version the group and members were read at; build
+    ETags from it so they always describe what these rows say.
+    """
+
+    def __init__(self, access: GroupAccess, member: dict):
+        self.access = access
+        self.group = access.group
+        self.members = access.members
+        self.version = access.version
+        self.member = member
+
+    def active_members(self):
+        return self.access.active_members()
+
+    @property
+    def role(self) -> UserRole:
+        return self.member["role"]
+
+async def load_group_access(groupId: str):
+    # One statement, so the version matches the rows read with it
+    query = select(
+        groups.c.id, groups.c.name, groups.c.description, groups.c.createdAt, groups.c.createdBy, groups.c.ledgerVersion,
+        *[column.label(f"member_{column.name}") for column in members.c],
+    ).select_from(
+        groups.outerjoin(members, members.c.groupId == groups.c.id)
+    ).where(groups.c.id == groupId)
+    rows = await database.fetch_all(query)
+    if not rows:
+        return None
+
+    group = {key: rows[0][key] for key in ("id", "name", "description", "createdAt", "createdBy")}
+    group_members = {}
+    for row in rows:
+        if row["member_userId"] is not None:
+            group_members[row["member_userId"]] = {column.name: row[f"member_{column.name}"] for column in members.c}
+    return GroupAccess(group, group_members, rows[0]["ledgerVersion"])
+
+def invalidate_group_access(groupId: str):
+    group_access_cache.invalidate(groupId)
+
+async def get_group_membership(groupId: str, current_user: User = Depends(get_current_user)) -> GroupMembership:
+    """Dependency: the caller's membership of the ``groupId`` path parameter; 404 if no such group, 403 if not a member."""
+    version = await get_group_version(groupId)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    access = group_access_cache.get(groupId)
+    if access is None or access.version < version:
+        access = await load_group_access(groupId)
+        if access is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+        # Another request may have cached a newer load meanwhile
+        cached = group_access_cache.get(groupId)
+        if cached is None or cached.version < access.version:
+            group_access_cache[groupId] = access
+
+    member = access.members.get(current_user.id)
+    if member is None:
+        raise HTTPException(status_code=403, detail="Not authorized to access this group")
+    return GroupMembership(access, member)
+
+def require_group_role(roles, detail: str):
+    """Dependency factory: like ``get_group_membership``, but also requires one of ``roles``."""
+    async def dependency(membership: GroupMembership = Depends(get_group_membership)) -> GroupMembership:
+        if membership.role not in roles:
+            raise HTTPException(status_code=403, detail=detail)
+        return membership
+    return dependency
@@ -0,0 +1,223 @@
+"""Cache invalidation and pub/sub shared by all worker processes on a host.
+
+Each worker keeps its caches in memory and reads them without any IPC; what is
+shared is the message bus. Invalidating a ``SharedCache`` key or publishing a
+group event goes to every worker through it.
+
+Without ``BACKPLANE_URL`` the bus is in-process, which is all a single worker
+needs. With several uvicorn workers, start the broker once per host and point
+every worker at it::
+
+    python backplane.py --url unix:///tmp/kanak-backplane.sock
+    BACKPLANE_URL=unix:///tmp/kanak-backplane.sock uvicorn main:app --workers 4
+
+``tcp://127.0.0.1:<port>`` works too, e.g. where Unix sockets are unavailable.
+Messages published while a worker is disconnected from the broker are lost, so
+workers clear their caches and drop their event subscribers whenever they
+connect or lose the connection.
+"""
+import argparse
+import asyncio
+import json
+import os
+from collections import defaultdict
+from typing import Callable, Optional
+from urllib.parse import urlparse
+from cachetools import TTLCache
+
+BACKPLANE_URL = os.getenv("BACKPLANE_URL")
+BACKPLANE_RECONNECT_SECONDS = float(os.getenv("BACKPLANE_RECONNECT_SECONDS", "1"))
+# The broker disconnects workers that stop reading rather than buffer for them
+BACKPLANE_MAX_BUFFER_BYTES = int(os.getenv("BACKPLANE_MAX_BUFFER_BYTES", str(4 * 1024 * 1024)))
+
+async def open_connection(url: str):
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return await asyncio.open_unix_connection(parsed.path)
+    if parsed.scheme == "tcp":
+        return await asyncio.open_connection(parsed.hostname, parsed.port)
+    raise ValueError(f"Unsupported BACKPLANE_URL: {url}")
+
+class InMemoryMessageBus:
+    """Delivers messages to handlers in this process only."""
+
+    def __init__(self):
+        self._handlers = defaultdict(list)
+        self._reset_handlers = []
+
+    def subscribe(self, channel: str, handler: Callable[[dict], None]):
+        self._handlers[channel].append(handler)
+
+    def on_reset(self, handler: Callable[[], None]):
+        """Register a handler for when messages may have been missed."""
+        self._reset_handlers.append(handler)
+
+    def publish(self, channel: str, message: dict):
+        self._dispatch(channel, message)
+
+    def _dispatch(self, channel: str, message: dict):
+        for handler in self._handlers.get(channel, ()):
+            handler(message)
+
+    def _reset(self):
+        for handler in self._reset_handlers:
+            handler()
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class SocketMessageBus(InMemoryMessageBus):
+    """Delivers messages locally at once and to the other workers through the broker."""
+
+    def __init__(self, url: str, reconnect_seconds: float = BACKPLANE_RECONNECT_SECONDS):
+        super().__init__()
+        self.url = url
+        self.reconnect_seconds = reconnect_seconds
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+
+    def publish(self, channel: str, message: dict):
+        self._dispatch(channel, message)
+        if self._writer is not None:
+            self._writer.write(json.dumps({"channel": channel, "message": message}).encode() + b"\n")
+
+    async def start(self, timeout: float = 1.0):
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"WARNING: Backplane broker at {self.url} is not reachable yet; caches stay local until it is.")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        # Only cancellation ends the loop; anything else is logged and the worker reconnects
+        while True:
+            try:
+                reader, writer = await open_connection(self.url)
+                # Wait until the broker has registered us, so nothing sent from now on is missed
+                await reader.readline()
+            except OSError:
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+            except Exception as e:
+                print(f"WARNING: Could not connect to backplane broker: {e!r}")
+                await asyncio.sleep(self.reconnect_seconds)
+                continue
+            self._writer = writer
+            try:
+                self._reset()
+                self._connected.set()
+                async for line in reader:
+                    envelope = json.loads(line)
+                    self._dispatch(envelope["channel"], envelope["message"])
+            except Exception as e:
+                print(f"WARNING: Lost connection to backplane broker: {e!r}")
+            finally:
+                self._writer = None
+                self._connected.clear()
+                writer.close()
+                self._reset()
+            await asyncio.sleep(self.reconnect_seconds)
+
+def create_message_bus(url: Optional[str] = BACKPLANE_URL):
+    return SocketMessageBus(url) if url else InMemoryMessageBus()
+
+message_bus = create_message_bus()
+
+INVALIDATE_CHANNEL = "cache.invalidate"
+
+class SharedCache:
+    """A per-process TTL cache whose invalidations reach every worker."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float, bus=message_bus):
+        self.name = name
+        self.bus = bus
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        bus.subscribe(INVALIDATE_CHANNEL, self._handle_invalidate)
+        bus.on_reset(self._cache.clear)
+
+    def get(self, key, default=None):
+        return self._cache.get(key, default)
+
+    def __setitem__(self, key, value):
+        self._cache[key] = value
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def invalidate(self, *keys):
+        """Drop ``keys`` here and in every other worker."""
+        self.bus.publish(INVALIDATE_CHANNEL, {"cache": self.name, "keys": list(keys)})
+
+    def clear(self):
+        self.bus.publish(INVALIDATE_CHANNEL, {"cache": self.name, "keys": None})
+
+    def _handle_invalidate(self, message: dict):
+        if message["cache"] != self.name:
+            return
+        if message["keys"] is None:
+            self._cache.clear()
+        else:
+            for key in message["keys"]:
+                self._cache.pop(key, None)
+
+async def run_broker(url: str):
+    """Relay every line a worker sends to all the other connected workers."""
+    clients = set()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        clients.add(writer)
+        writer.write(b"\n")
+        try:
+            async for line in reader:
+                for other in list(clients):
+                    if other is writer:
+                        continue
+                    if other.transport.get_write_buffer_size() > BACKPLANE_MAX_BUFFER_BYTES:
+                        # The worker reconnects and resets its caches
+                        clients.discard(other)
+                        other.close()
+                        continue
+                    other.write(line)
+        except OSError:
+            pass
+        finally:
+            clients.discard(writer)
+            writer.close()
+
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        if os.path.exists(parsed.path):
+            os.remove(parsed.path)
+        server = await asyncio.start_unix_server(handle, parsed.path)
+    elif parsed.scheme == "tcp":
+        server = await asyncio.start_server(handle, parsed.hostname, parsed.port)
+    else:
+        raise ValueError(f"Unsupported backplane URL: {url}")
+    print(f"Backplane broker listening on {url}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the cache/pub-sub broker shared by the API's worker processes.")
+    parser.add_argument("--url", default=BACKPLANE_URL or "unix:///tmp/kanak-backplane.sock")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run_broker(args.url))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Cost of sending split amounts versus letting the server allocate them.
+
+Compares a transaction whose AMOUNT splits carry every member's share with
+the same total sent as EQUAL ``participantIds``: request size, parse and
+allocate throughput, and end-to-end POSTs against a throwaway SQLite database.
+Run from ``backend/``::
+
+    python benchmarks/allocation.py --members 50 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def bodies(member_ids, total_minor: int):
+    shares = [total_minor // len(member_ids)] * len(member_ids)
+    shares[0] += total_minor - sum(shares)
+    base = {"type": "DEBIT", "amount": total_minor / 100, "description": "Benchmark", "payerId": member_ids[0]}
+    return {
+        "expanded splits": {**base, "splitMode": "AMOUNT", "splits": [
+            {"userId": userId, "amount": share / 100} for userId, share in zip(member_ids, shares)
+        ]},
+        "participantIds": {**base, "splitMode": "EQUAL", "participantIds": member_ids},
+    }
+
+def bench_allocation(members: int, repeats: int):
+    from models import TransactionCreate
+    from routers.transactions import allocate_splits
+
+    for name, body in bodies([str(uuid4()) for _ in range(members)], 123456).items():
+        payload = json.dumps(body)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            allocate_splits(TransactionCreate.model_validate_json(payload))
+        rate = repeats / (time.perf_counter() - started)
+        print(f"parse and allocate, {members} members, {name}: {rate:.0f}/s, {len(payload)} B request")
+
+def bench_requests(members: int, repeats: int):
+    import sqlalchemy as sa
+    from fastapi.testclient import TestClient
+
+    import main
+    import security
+    from database import engine
+    from models import User
+
+    users = []
+    with engine.begin() as connection:
+        for i in range(members):
+            user_id = str(uuid4())
+            connection.execute(
+                sa.text("INSERT INTO users (id, username, email, supabase_user_id) VALUES (:id, :username, :email, :sub)"),
+                {"id": user_id, "username": f"bench{i}-{user_id[:8]}", "email": f"{user_id}@example.com", "sub": f"sub-{user_id}"},
+            )
+            users.append(User(id=user_id, username=f"bench{i}-{user_id[:8]}", email=f"{user_id}@example.com", supabase_user_id=f"sub-{user_id}"))
+    main.app.dependency_overrides[security.get_current_user] = lambda: users[0]
+
+    with TestClient(main.app) as client:
+        groupId = client.post("/groups/", json={"name": "Benchmark"}).json()["id"]
+        with engine.begin() as connection:
+            for user in users[1:]:
+                connection.execute(
+                    sa.text('INSERT INTO members ("userId", "groupId", username, role, "isActive") VALUES (:userId, :groupId, :username, \'EDITOR\', 1)'),
+                    {"userId": user.id, "groupId": groupId, "username": user.username},
+                )
+        for name, body in bodies([user.id for user in users], 10000).items():
+            started = time.perf_counter()
+            for _ in range(repeats):
+                response = client.post(f"/groups/{groupId}/transactions", json=body)
+                assert response.status_code == 201, response.text
+            rate = repeats / (time.perf_counter() - started)
+            print(f"POST, {members} members, {name}: {rate:.0f} tx/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare client-sent split amounts with server-side allocation.")
+    parser.add_argument("--members", type=int, nargs="+", default=[50, 500], help="Members sharing each transaction")
+    parser.add_argument("--repeats", type=int, default=200, help="Transactions parsed per case")
+    parser.add_argument("--requests", type=int, default=100, help="Transactions POSTed per case, with the smallest member count")
+    args = parser.parse_args()
+
+    # Always a throwaway database, never the one the environment points at
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='kanak-bench-'), 'kanak.db')}"
+    sys.path.insert(0, BACKEND_DIR)
+    for members in args.members:
+        bench_allocation(members, args.repeats)
+    bench_requests(min(args.members), args.requests)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Write and read throughput of SQLite production mode against the default mode.
+
+Runs the app in-process on a fresh SQLite file once per mode: concurrent
+clients add transactions spread over a few groups while readers keep fetching
+balances. Each mode runs in its own process, since the settings are read at
+import. Run from ``backend/``::
+
+    python benchmarks/sqlite_mode.py --writers 64 --writes 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from uuid import uuid4
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"default": "0", "production": "1"}
+
+async def run_workload(args):
+    import httpx
+    import sqlalchemy as sa
+
+    import main
+    import security
+    from database import engine
+    from ledger import find_balance_drift
+    from models import User
+
+    user_id = str(uuid4())
+    with engine.begin() as connection:
+        connection.execute(
+            sa.text("INSERT INTO users (id, username, email, supabase_user_id) VALUES (:id, :username, :email, :sub)"),
+            {"id": user_id, "username": "bench", "email": "bench@example.com", "sub": f"sub-{user_id}"},
+        )
+    user = User(id=user_id, username="bench", email="bench@example.com", supabase_user_id=f"sub-{user_id}")
+    main.app.dependency_overrides[security.get_current_user] = lambda: user
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            group_ids = [(await client.post("/groups/", json={"name": f"Group {i}"})).json()["id"] for i in range(args.groups)]
+            statuses = {}
+            done = asyncio.Event()
+
+            async def write(writer: int):
+                groupId = group_ids[writer % len(group_ids)]
+                for _ in range(args.writes):
+                    response = await client.post(f"/groups/{groupId}/transactions", json={
+                        "type": "DEBIT", "amount": 10, "description": "Benchmark", "payerId": user_id,
+                        "splitMode": "EQUAL", "participantIds": [user_id],
+                    })
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            async def read() -> int:
+                reads = 0
+                while not done.is_set():
+                    await client.get(f"/groups/{group_ids[0]}/balances")
+                    reads += 1
+                return reads
+
+            readers = [asyncio.create_task(read()) for _ in range(args.readers)]
+            started = time.perf_counter()
+            await asyncio.gather(*(write(writer) for writer in range(args.writers)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            reads = sum(await asyncio.gather(*readers))
+        drift = await find_balance_drift()
+
+    return {
+        "writesPerSecond": args.writers * args.writes / elapsed,
+        "readsPerSecond": reads / elapsed,
+        "seconds": elapsed,
+        "statuses": statuses,
+        "driftedBalances": len(drift),
+    }
+
+def run_mode(mode: str, args):
+    env = {
+        **os.environ,
+        "SQLITE_PRODUCTION_MODE": MODES[mode],
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='kanak-bench-'), 'kanak.db')}",
+    }
+    command = [sys.executable, os.path.abspath(__file__), "--run", mode, *sys.argv[1:]]
+    output = subprocess.run(command, env=env, cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare SQLite production mode with the default mode under concurrent writes.")
+    parser.add_argument("--writers", type=int, default=64, help="Concurrent clients adding transactions")
+    parser.add_argument("--writes", type=int, default=10, help="Transactions each writer adds")
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent clients fetching balances meanwhile")
+    parser.add_argument("--groups", type=int, default=8, help="Groups the writers are spread over")
+    parser.add_argument("--run", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        sys.path.insert(0, BACKEND_DIR)
+        print(json.dumps(asyncio.run(run_workload(args))))
+        return
+
+    for mode in MODES:
+        result = run_mode(mode, args)
+        print(
+            f"{mode:>10}: {result['writesPerSecond']:.0f} writes/s, {result['readsPerSecond']:.0f} reads/s alongside, "
+            f"statuses {result['statuses']}, {result['driftedBalances']} drifted balances"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,242 @@
+import asyncio
+import bisect
 import os
+import random
+import sqlite3
+import time
 from databases import Database
+from fastapi import HTTPException, status
 from sqlalchemy import create_engine, MetaData
+from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
+from profiling import query_profiler
+from sqlite_mode import (
+    SQLITE_PRODUCTION_MODE,
+    SQLITE_READ_POOL_SIZE,
+    SQLITE_WRITE_BATCH_SIZE,
+    SQLiteConnectionPool,
+    SQLiteWriter,
+)
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./kanak.db")
 
+# Connections each worker process keeps open to Postgres; size max against the
+# server's max_connections divided by the number of uvicorn workers
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+# How long a request waits for a free connection before it gets a 503
+DB_POOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT_SECONDS", "10"))
+# Waits longer than this are logged
+DB_SLOW_ACQUIRE_SECONDS = float(os.getenv("DB_SLOW_ACQUIRE_SECONDS", "0.1"))
+# Postgres cancels statements running longer than this
+DB_STATEMENT_TIMEOUT_SECONDS = float(os.getenv("DB_STATEMENT_TIMEOUT_SECONDS", "30"))
+
 connect_args = {}
-engine_kwargs = {}
 
 if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
+    # SQLite connections are opened per use, so there is no pool to size
+    database_options = {}
 else:
-    engine_kwargs = {"pool_pre_ping": True}
+    database_options = {
+        "min_size": DB_POOL_MIN_SIZE,
+        "max_size": DB_POOL_MAX_SIZE,
+        "command_timeout": DB_STATEMENT_TIMEOUT_SECONDS,
+        "server_settings": {"statement_timeout": str(int(DB_STATEMENT_TIMEOUT_SECONDS * 1000))},
+    }
 
-database = Database(DATABASE_URL)
+database = Database(DATABASE_URL, **database_options)
+# Records the queries each request runs, see profiling.py
+query_profiler.instrument(database)
 metadata = MetaData()
 
+# WAL, read-only readers and a single queued writer, see sqlite_mode.py
+if SQLITE_PRODUCTION_MODE and DATABASE_URL.startswith("sqlite"):
+    sqlite_pool = SQLiteConnectionPool(database.url.database, SQLITE_READ_POOL_SIZE)
+    sqlite_writer = SQLiteWriter(database, sqlite_pool, SQLITE_WRITE_BATCH_SIZE)
+else:
+    sqlite_pool = sqlite_writer = None
+
+# How many times a write is re-run after a deadlock or serialization failure
+TRANSACTION_RETRIES = int(os.getenv("TRANSACTION_RETRIES", "3"))
+# Postgres SQLSTATEs for transactions that may well succeed if simply run again
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+# Only used for migrations at startup and maintenance scripts, so it holds no idle connections
 engine = create_engine(
     DATABASE_URL,
     connect_args=connect_args,
-    **engine_kwargs
+    poolclass=NullPool,
 )
+
+# Upper bounds of the acquire latency histogram
+ACQUIRE_LATENCY_BUCKETS_SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class PoolMonitor:
+    """Times every connection checkout from the ``databases`` pool and bounds how long it may wait."""
+
+    def __init__(self, acquire_timeout: float, slow_acquire_seconds: float, buckets=ACQUIRE_LATENCY_BUCKETS_SECONDS):
+        self.acquire_timeout = acquire_timeout
+        self.slow_acquire_seconds = slow_acquire_seconds
+        self.buckets = buckets
+        self._pool = None
+        self._backend_pool = None
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.slow_acquires = 0
+        self.total_acquire_seconds = 0.0
+        self.max_acquire_seconds = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+    def instrument(self, backend, bounded: bool, pool=None):
+        """Monitor the ``acquire``/``release`` pair that ``databases`` calls on its backend pool.
+
+        ``pool``, if given, replaces the backend's own pool until ``uninstrument``.
+        Only a ``bounded`` pool can run out of connections, so only its acquires
+        get the timeout; asyncpg hands the connection back if it fires.
+        """
+        self._backend_pool = backend._pool
+        self._pool = pool or backend._pool
+        backend._pool = MonitoredPool(self, self._pool, bounded)
+
+    def uninstrument(self, backend):
+        """Give ``backend`` its own pool back, so it closes that one and can connect again."""
+        backend._pool = self._backend_pool
+        self._backend_pool = None
+
+    async def acquire(self, pool, bounded: bool):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = await (pool.acquire(timeout=self.acquire_timeout) if bounded else pool.acquire())
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The database is busy, please retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        finally:
+            self.waiting -= 1
+        self.in_use += 1
+        self._observe(time.perf_counter() - started)
+        return connection
+
+    async def release(self, pool, connection):
+        self.in_use -= 1
+        return await pool.release(connection)
+
+    def _observe(self, seconds: float):
+        self.acquired += 1
+        self.total_acquire_seconds += seconds
+        self.max_acquire_seconds = max(self.max_acquire_seconds, seconds)
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        if seconds > self.slow_acquire_seconds:
+            self.slow_acquires += 1
+            print(f"WARNING: Waited {seconds * 1000:.0f} ms for a database connection ({self.in_use} in use, {self.waiting} waiting).")
+
+    def metrics(self):
+        acquired = self.acquired or 1
+        cumulative, histogram = 0, {}
+        for bound, count in zip([*self.buckets, "+Inf"], self.bucket_counts):
+            cumulative += count
+            histogram[str(bound)] = cumulative
+        pool_size = getattr(self._pool, "get_size", None)
+        idle_size = getattr(self._pool, "get_idle_size", None)
+        return {
+            "minSize": database_options.get("min_size"),
+            "maxSize": database_options.get("max_size"),
+            "size": pool_size() if pool_size else None,
+            "idle": idle_size() if idle_size else None,
+            "inUse": self.in_use,
+            "waiting": self.waiting,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "slowAcquires": self.slow_acquires,
+            "avgAcquireMs": round(self.total_acquire_seconds / acquired * 1000, 2),
+            "maxAcquireMs": round(self.max_acquire_seconds * 1000, 2),
+            # Cumulative counts of acquires at or under each bound, in seconds
+            "acquireSecondsBuckets": histogram,
+        }
+
+class MonitoredPool:
+    """Stands in for a backend pool, reporting acquires and releases to a ``PoolMonitor``.
+
+    asyncpg's pool has ``__slots__``, so its methods can't be wrapped in place;
+    everything else is passed through to the pool.
+    """
+
+    def __init__(self, monitor: PoolMonitor, pool, bounded: bool):
+        self._monitor = monitor
+        self._pool = pool
+        self._bounded = bounded
+
+    async def acquire(self):
+        return await self._monitor.acquire(self._pool, self._bounded)
+
+    async def release(self, connection):
+        return await self._monitor.release(self._pool, connection)
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+pool_monitor = PoolMonitor(DB_POOL_ACQUIRE_TIMEOUT_SECONDS, DB_SLOW_ACQUIRE_SECONDS)
+
+async def connect_database():
+    """Connect the shared ``database`` and start monitoring its pool."""
+    await database.connect()
+    # databases keeps its pool private; both the asyncpg and SQLite backends call acquire/release on it
+    if sqlite_pool is not None:
+        await sqlite_pool.open()
+        await sqlite_writer.start()
+    pool_monitor.instrument(
+        database._backend, bounded="max_size" in database_options or sqlite_pool is not None, pool=sqlite_pool
+    )
+
+async def disconnect_database():
+    if sqlite_pool is not None:
+        await sqlite_writer.stop()
+        await sqlite_pool.close()
+    pool_monitor.uninstrument(database._backend)
+    await database.disconnect()
+
+def run_migrations():
+    """Upgrade the database schema to the latest Alembic revision."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+def is_retryable_error(exc: Exception) -> bool:
+    sqlstate = getattr(exc, "sqlstate", None) or getattr(exc, "pgcode", None)
+    if sqlstate in RETRYABLE_SQLSTATES:
+        return True
+    # SQLite reports a competing writer as a locked or busy database
+    return isinstance(exc, sqlite3.OperationalError) and ("locked" in str(exc) or "busy" in str(exc))
+
+async def run_in_transaction(operation, retries: int = TRANSACTION_RETRIES):
+    """Run ``await operation()`` in one DB transaction, re-running it on deadlocks and serialization failures.
+
+    Every write goes through here. The operation may run more than once, so it
+    must not touch anything outside the database: publish events and invalidate
+    caches once this returns. Don't call it inside another transaction, whose
+    earlier work a retry would lose. In SQLite production mode the operation
+    runs on the writer task, batched with other writes.
+    """
+    for attempt in range(retries + 1):
+        try:
+            if sqlite_writer is not None and sqlite_writer.running and not sqlite_writer.in_writer():
+                # The writer task doesn't share the request's context, so carry its profile along
+                return await sqlite_writer.submit(query_profiler.bind(operation))
+            async with database.transaction():
+                return await operation()
+        except Exception as e:
+            if attempt == retries or not is_retryable_error(e):
+                raise
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
@@ -0,0 +1,40 @@
+"""Conditional GET support for group reads.
+
+Every write to a group bumps ``groups.ledgerVersion``, so an ETag derived from
+it changes exactly when the group's data does. The membership check reads it
+with a single primary-key lookup, and handlers tag responses with
+``GroupMembership.version`` and answer 304 before running any member or split query.
+"""
+import hashlib
+from fastapi import Request, Response
+from sqlalchemy import select
+from database import database
+from models import groups
+
+# Clients may keep responses but must revalidate them on every use
+CACHE_CONTROL = "private, no-cache"
+
+async def get_group_version(groupId: str) -> int:
+    """The group's current ledger version, or None if there is no such group."""
+    return await database.fetch_val(select(groups.c.ledgerVersion).where(groups.c.id == groupId))
+
+def group_etag(groupId: str, version: int, *variant) -> str:
+    """Weak ETag for a representation of the group at ``version``; ``variant`` tells endpoints and parameters apart."""
+    digest = hashlib.sha1("|".join(map(str, (groupId, version, *variant))).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # Weak comparison: W/"x" and "x" match
+    return "*" in candidates or etag.removeprefix("W/") in (candidate.removeprefix("W/") for candidate in candidates)
+
+def conditional_response(request: Request, response: Response, etag: str):
+    """Return a 304 if the client already has ``etag``; otherwise tag ``response`` and return None."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
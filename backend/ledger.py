@@ -0,0 +1,162 @@
+"""Materialized member balances.
+
+``member_balances`` holds each member's running balance per group. Every write
+to the ledger applies its delta here inside the same DB transaction, so balance
+reads never rescan transactions. Amounts are integer minor units (see
+``money.py``), so stored balances match the ledger exactly. Run ``python ledger.py verify`` to compare the
+table against a full recomputation, and ``python ledger.py rebuild`` to reset it.
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from uuid import uuid4
+from sqlalchemy import case, func, select, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import database, run_in_transaction
+from money import format_minor_units
+from models import ChangeEntity, TransactionType, groups, member_balances, tombstones, transactions, transaction_splits
+
+def transaction_balance_deltas(transaction, splits, sign: int = 1):
+    """Per-user balance change caused by one transaction.
+
+    A CREDIT is money paid into the group: the payer is owed the amount and each
+    split owes its share. A DEBIT is money taken out: the payer owes the amount
+    and each split is owed its share. ``sign=-1`` gives the reversal.
+    """
+    direction = sign if transaction["type"] == TransactionType.CREDIT else -sign
+    deltas = defaultdict(int)
+    deltas[transaction["payerId"] or transaction["createdById"]] += direction * transaction["amount"]
+    for split in splits:
+        deltas[split["userId"]] -= direction * split["amount"]
+    return deltas
+
+def merge_deltas(*delta_maps):
+    merged = defaultdict(int)
+    for deltas in delta_maps:
+        for userId, delta in deltas.items():
+            merged[userId] += delta
+    return merged
+
+async def apply_balance_deltas(groupId: str, deltas):
+    """Add ``deltas`` to the stored balances of a group with a single upsert."""
+    rows = [{"groupId": groupId, "userId": userId, "balance": delta} for userId, delta in deltas.items() if delta]
+    if not rows:
+        return
+    insert = postgresql_insert if database.url.dialect == "postgresql" else sqlite_insert
+    query = insert(member_balances).values(rows)
+    query = query.on_conflict_do_update(
+        index_elements=[member_balances.c.groupId, member_balances.c.userId],
+        set_={"balance": member_balances.c.balance + query.excluded.balance},
+    )
+    await database.execute(query)
+
+async def bump_ledger_version(groupId: str) -> int:
+    """Mark the group's ledger as changed so anything cached against the old version is dropped.
+
+    Returns the new version, which callers stamp on the rows they write so delta
+    sync can find them. Call it inside the write's DB transaction.
+    """
+    query = groups.update().where(groups.c.id == groupId).values(
+        ledgerVersion=groups.c.ledgerVersion + 1
+    ).returning(groups.c.ledgerVersion)
+    return await database.fetch_val(query)
+
+async def record_tombstones(groupId: str, entity_type: ChangeEntity, entity_ids, version: int):
+    """Remember deleted rows so delta sync can tell clients to drop them."""
+    values = [
+        {"id": str(uuid4()), "groupId": groupId, "entityType": entity_type, "entityId": entity_id, "changeVersion": version}
+        for entity_id in entity_ids
+    ]
+    if values:
+        await database.execute(tombstones.insert().values(values))
+
+async def move_balances(groupId: str, from_user_id: str, to_user_id: str):
+    """Hand a member's stored balance over to another user, e.g. their guest replacement."""
+    query = member_balances.update().where(
+        (member_balances.c.groupId == groupId) & (member_balances.c.userId == from_user_id)
+    ).values(userId=to_user_id)
+    await database.execute(query)
+
+def balance_deltas_query(groupId: str = None):
+    """Per-user balance contributions of every transaction, optionally limited to one group."""
+    is_credit = transactions.c.type == TransactionType.CREDIT
+    payer_deltas = select(
+        transactions.c.groupId,
+        func.coalesce(transactions.c.payerId, transactions.c.createdById).label("userId"),
+        case((is_credit, transactions.c.amount), else_=-transactions.c.amount).label("delta"),
+    )
+    split_deltas = select(
+        transactions.c.groupId,
+        transaction_splits.c.userId.label("userId"),
+        case((is_credit, -transaction_splits.c.amount), else_=transaction_splits.c.amount).label("delta"),
+    ).select_from(
+        transaction_splits.join(transactions, transaction_splits.c.transactionId == transactions.c.id)
+    )
+    if groupId is not None:
+        payer_deltas = payer_deltas.where(transactions.c.groupId == groupId)
+        split_deltas = split_deltas.where(transactions.c.groupId == groupId)
+    return union_all(payer_deltas, split_deltas).subquery()
+
+async def compute_balances_from_ledger(groupId: str = None):
+    """Recompute balances from scratch, keyed by ``(groupId, userId)``."""
+    deltas = balance_deltas_query(groupId)
+    query = select(
+        deltas.c.groupId, deltas.c.userId, func.sum(deltas.c.delta).label("balance")
+    ).group_by(deltas.c.groupId, deltas.c.userId)
+    # Postgres sums BIGINT into NUMERIC
+    return {(row["groupId"], row["userId"]): int(row["balance"] or 0) for row in await database.fetch_all(query)}
+
+async def find_balance_drift(groupId: str = None):
+    """List every ``(groupId, userId)`` whose stored balance differs from the ledger."""
+    expected = await compute_balances_from_ledger(groupId)
+    stored_query = member_balances.select()
+    if groupId is not None:
+        stored_query = stored_query.where(member_balances.c.groupId == groupId)
+    stored = {(row["groupId"], row["userId"]): row["balance"] for row in await database.fetch_all(stored_query)}
+
+    drift = []
+    for key in sorted(expected.keys() | stored.keys()):
+        expected_balance, stored_balance = expected.get(key, 0), stored.get(key, 0)
+        if expected_balance != stored_balance:
+            drift.append({"groupId": key[0], "userId": key[1], "stored": stored_balance, "expected": expected_balance})
+    return drift
+
+async def rebuild_balances(groupId: str = None):
+    """Replace stored balances with a full recomputation from the ledger."""
+    expected = await compute_balances_from_ledger(groupId)
+    rows = [{"groupId": key[0], "userId": key[1], "balance": balance} for key, balance in expected.items()]
+
+    async def write():
+        delete_query = member_balances.delete()
+        if groupId is not None:
+            delete_query = delete_query.where(member_balances.c.groupId == groupId)
+        await database.execute(delete_query)
+        if rows:
+            await database.execute_many(member_balances.insert(), rows)
+
+    await run_in_transaction(write)
+    return len(rows)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Verify or rebuild the materialized member balances.")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    parser.add_argument("--group", dest="groupId", help="Only process this group ID")
+    args = parser.parse_args()
+
+    await database.connect()
+    try:
+        if args.command == "rebuild":
+            count = await rebuild_balances(args.groupId)
+            print(f"Rebuilt {count} balance rows.")
+            return 0
+        drift = await find_balance_drift(args.groupId)
+        for row in drift:
+            print(f"{row['groupId']} {row['userId']}: stored {format_minor_units(row['stored'])}, expected {format_minor_units(row['expected'])}")
+        print(f"{len(drift)} balance rows drifted.")
+        return 1 if drift else 0
+    finally:
+        await database.disconnect()
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
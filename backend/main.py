@@ -1,9 +1,18 @@
-from fastapi import FastAPI
+import math
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from database import database, engine, metadata
-from routers import auth, groups, invitations, transactions
+from backplane import message_bus
+from database import connect_database, disconnect_database, pool_monitor, run_migrations, sqlite_writer
+from profiling import QUERY_METRICS_ENABLED, QueryProfilingMiddleware, query_profiler
+from pubsub import group_events
+from security import jwks_store, password_hash_pool, require_metrics_token
+from routers import auth, balances, changes, events, groups, invitations, statements, transactions
 
-metadata.create_all(bind=engine)
+run_migrations()
 
 app = FastAPI(
     title="Kanak API",
@@ -11,13 +20,25 @@ app = FastAPI(
     description="Backend API specification for Kanak, a group expense tracker with role-based access, invitation systems, and complex transaction splitting."
 )
 
+@app.exception_handler(RequestValidationError)
+async def request_validation_exception_handler(request: Request, exc: RequestValidationError):
+    # The default handler echoes the invalid input back, and JSON has no NaN or Infinity to echo
+    detail = jsonable_encoder(exc.errors(), custom_encoder={float: lambda value: value if math.isfinite(value) else str(value)})
+    return JSONResponse(status_code=422, content={"detail": detail})
+
 @app.on_event("startup")
 async def startup():
-    await database.connect()
+    await connect_database()
+    await message_bus.start()
+    await jwks_store.start()
 
 @app.on_event("shutdown")
 async def shutdown():
-    await database.disconnect()
+    await jwks_store.stop()
+    password_hash_pool.shutdown()
+    statements.statement_renderer.shutdown()
+    await message_bus.stop()
+    await disconnect_database()
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,13 +46,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+# Outermost, so request latency covers everything else
+app.add_middleware(QueryProfilingMiddleware, profiler=query_profiler)
 
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(groups.router, prefix="/groups", tags=["Groups"])
 app.include_router(invitations.router, prefix="/invitations", tags=["Invitations"])
 app.include_router(transactions.router, prefix="/groups", tags=["Transactions"])
+app.include_router(balances.router, prefix="/groups", tags=["Balances"])
+app.include_router(statements.router, prefix="/groups", tags=["Statements"])
+app.include_router(changes.router, prefix="/groups", tags=["Sync"])
+app.include_router(events.router, prefix="/groups", tags=["Sync"])
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the Kanak API"}
+
+# Operational endpoints, for the scraper holding METRICS_TOKEN only
+metrics_dependencies = [Depends(require_metrics_token)]
+
+@app.get("/metrics/password-hashing", include_in_schema=False, dependencies=metrics_dependencies)
+def read_password_hashing_metrics():
+    return password_hash_pool.metrics()
+
+@app.get("/metrics/events", include_in_schema=False, dependencies=metrics_dependencies)
+def read_event_metrics():
+    return group_events.metrics()
+
+@app.get("/metrics/database", include_in_schema=False, dependencies=metrics_dependencies)
+def read_database_metrics():
+    metrics = pool_monitor.metrics()
+    if sqlite_writer is not None:
+        metrics["sqliteWriter"] = sqlite_writer.metrics()
+    return metrics
+
+@app.get("/metrics/queries", include_in_schema=False, dependencies=metrics_dependencies)
+def read_query_metrics():
+    if not QUERY_METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return query_profiler.metrics()
+
+@app.get("/metrics", include_in_schema=False, response_class=PlainTextResponse, dependencies=metrics_dependencies)
+def read_prometheus_metrics():
+    return PlainTextResponse(query_profiler.prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,122 @@
+"""Initial schema
+
+Databases created by the old ``metadata.create_all`` call already have these
+tables, so each one is only created when missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+user_role = sa.Enum("OWNER", "ADMIN", "EDITOR", "CONTRIBUTOR", "VIEWER", "GUEST", name="userrole")
+invitation_status = sa.Enum("PENDING", "ACCEPTED", "REJECTED", name="invitationstatus")
+transaction_type = sa.Enum("DEBIT", "CREDIT", name="transactiontype")
+split_mode = sa.Enum("EQUAL", "PERCENTAGE", "AMOUNT", name="splitmode")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing_tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False, unique=True),
+            sa.Column("email", sa.String(), nullable=False, unique=True),
+            sa.Column("hashed_password", sa.String(), nullable=True),
+            sa.Column("supabase_user_id", sa.String(), nullable=True),
+        )
+        op.create_index("ix_users_supabase_user_id", "users", ["supabase_user_id"], unique=True)
+
+    if "groups" not in existing_tables:
+        op.create_table(
+            "groups",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("description", sa.String()),
+            sa.Column("createdAt", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("createdBy", sa.String(), sa.ForeignKey("users.id")),
+        )
+
+    if "members" not in existing_tables:
+        op.create_table(
+            "members",
+            sa.Column("userId", sa.String(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("groupId", sa.String(), sa.ForeignKey("groups.id"), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("role", user_role, nullable=False),
+            sa.Column("joinedAt", sa.DateTime(), server_default=sa.func.now()),
+            sa.Column("isActive", sa.Boolean(), server_default="true", nullable=False),
+        )
+
+    if "invitations" not in existing_tables:
+        op.create_table(
+            "invitations",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("groupId", sa.String(), sa.ForeignKey("groups.id")),
+            sa.Column("groupName", sa.String()),
+            sa.Column("inviterId", sa.String(), sa.ForeignKey("users.id")),
+            sa.Column("inviterName", sa.String()),
+            sa.Column("inviteeId", sa.String(), sa.ForeignKey("users.id")),
+            sa.Column("inviteeEmail", sa.String()),
+            sa.Column("role", user_role),
+            sa.Column("status", invitation_status),
+            sa.Column("createdAt", sa.DateTime(), server_default=sa.func.now()),
+        )
+
+    if "transactions" not in existing_tables:
+        op.create_table(
+            "transactions",
+            sa.Column("id", sa.String(), primary_key=True),
+            sa.Column("groupId", sa.String(), sa.ForeignKey("groups.id")),
+            sa.Column("type", transaction_type),
+            sa.Column("amount", sa.Float()),
+            sa.Column("description", sa.String()),
+            sa.Column("date", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("createdBy", sa.String()),
+            sa.Column("createdById", sa.String(), sa.ForeignKey("users.id")),
+            sa.Column("payerId", sa.String(), sa.ForeignKey("users.id")),
+            sa.Column("splitMode", split_mode),
+        )
+
+    if "transaction_splits" not in existing_tables:
+        op.create_table(
+            "transaction_splits",
+            sa.Column("transactionId", sa.String(), sa.ForeignKey("transactions.id"), primary_key=True),
+            sa.Column("userId", sa.String(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("amount", sa.Float()),
+            sa.Column("percentage", sa.Float()),
+        )
+
+    if "member_balances" not in existing_tables:
+        op.create_table(
+            "member_balances",
+            sa.Column("groupId", sa.String(), sa.ForeignKey("groups.id"), primary_key=True),
+            sa.Column("userId", sa.String(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("balance", sa.Float(), nullable=False, server_default="0"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("member_balances")
+    op.drop_table("transaction_splits")
+    op.drop_table("transactions")
+    op.drop_table("invitations")
+    op.drop_table("members")
+    op.drop_table("groups")
+    op.drop_index("ix_users_supabase_user_id", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,40 @@
+"""Index the hot lookup columns
+
+``members(userId)`` is already served by the members primary key, which leads
+with ``userId``, and ``users(email)`` by its unique constraint.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 09:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_members_groupId_isActive", "members", ["groupId", "isActive"])
+    op.create_index("ix_transactions_groupId_date", "transactions", ["groupId", "date"])
+    op.create_index("ix_transactions_payerId", "transactions", ["payerId"])
+    op.create_index("ix_transaction_splits_userId", "transaction_splits", ["userId"])
+    op.create_index("ix_invitations_groupId_status", "invitations", ["groupId", "status"])
+    op.create_index("ix_invitations_inviteeEmail_status", "invitations", ["inviteeEmail", "status"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_invitations_inviteeEmail_status", table_name="invitations")
+    op.drop_index("ix_invitations_groupId_status", table_name="invitations")
+    op.drop_index("ix_transaction_splits_userId", table_name="transaction_splits")
+    op.drop_index("ix_transactions_payerId", table_name="transactions")
+    op.drop_index("ix_transactions_groupId_date", table_name="transactions")
+    op.drop_index("ix_members_groupId_isActive", table_name="members")
@@ -0,0 +1,51 @@
+"""Track change versions and tombstones for delta sync
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("members") as batch_op:
+        batch_op.add_column(sa.Column("changeVersion", sa.Integer(), nullable=False, server_default="0"))
+    with op.batch_alter_table("transactions") as batch_op:
+        batch_op.add_column(sa.Column("changeVersion", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.create_index("ix_transactions_groupId_changeVersion", ["groupId", "changeVersion"])
+
+    op.create_table(
+        "tombstones",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("groupId", sa.String(), nullable=False),
+        sa.Column("entityType", sa.Enum("TRANSACTION", "MEMBER", name="changeentity"), nullable=False),
+        sa.Column("entityId", sa.String(), nullable=False),
+        sa.Column("changeVersion", sa.Integer(), nullable=False),
+        sa.Column("deletedAt", sa.DateTime(), server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(["groupId"], ["groups.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_tombstones_groupId_changeVersion", "tombstones", ["groupId", "changeVersion"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tombstones_groupId_changeVersion", table_name="tombstones")
+    op.drop_table("tombstones")
+    with op.batch_alter_table("transactions") as batch_op:
+        batch_op.drop_index("ix_transactions_groupId_changeVersion")
+        batch_op.drop_column("changeVersion")
+    with op.batch_alter_table("members") as batch_op:
+        batch_op.drop_column("changeVersion")
@@ -0,0 +1,47 @@
+"""Store money as integer minor units
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 14:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column, new type, Postgres type name, scale): amounts are in cents, percentages in hundredths of a percent
+MONEY_COLUMNS = [
+    ("transactions", "amount", sa.BigInteger(), "bigint", 100),
+    ("transaction_splits", "amount", sa.BigInteger(), "bigint", 100),
+    ("transaction_splits", "percentage", sa.Integer(), "integer", 100),
+    ("member_balances", "balance", sa.BigInteger(), "bigint", 100),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column, new_type, postgresql_type, scale in MONEY_COLUMNS:
+        op.execute(f'UPDATE {table} SET "{column}" = round("{column}" * {scale})')
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                column,
+                existing_type=sa.Float(),
+                type_=new_type,
+                postgresql_using=f'round("{column}")::{postgresql_type}',
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column, new_type, _, scale in MONEY_COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, existing_type=new_type, type_=sa.Float())
+        op.execute(f'UPDATE {table} SET "{column}" = "{column}" / {scale}.0')
@@ -0,0 +1,31 @@
+"""Store SQLite transaction dates with fractional seconds
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 18:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # SQLite keeps datetimes as text. Dates from the CURRENT_TIMESTAMP default lack the
+    # fractional seconds of the dates SQLAlchemy writes, and the two compare wrongly as strings.
+    if op.get_context().dialect.name == "sqlite":
+        op.execute("UPDATE transactions SET date = date || '.000000' WHERE length(date) = 19")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Both forms read back as the same datetime, so there is nothing to undo
+    pass
@@ -0,0 +1,30 @@
+"""Index invitations by invitee
+
+A user's pending invitations match on ``inviteeId`` or ``inviteeEmail``; with
+only the email indexed, the ``OR`` made the lookup scan the whole table.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 18:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_invitations_inviteeId_status", "invitations", ["inviteeId", "status"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_invitations_inviteeId_status", table_name="invitations")
@@ -0,0 +1,34 @@
+"""Index transactions by payer within a group
+
+The transaction list filtered by ``payerId`` matches on the group too, and
+the planner answered it from ``ix_transactions_groupId_date``, reading every
+transaction of the group. Widening the payer index to ``(payerId, groupId,
+date)`` serves that filter and still serves lookups by payer alone.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 21:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_transactions_payerId_groupId_date", "transactions", ["payerId", "groupId", "date"])
+    op.drop_index("ix_transactions_payerId", table_name="transactions")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index("ix_transactions_payerId", "transactions", ["payerId"])
+    op.drop_index("ix_transactions_payerId_groupId_date", table_name="transactions")
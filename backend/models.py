@@ -1,9 +1,11 @@
 from sqlalchemy import (
+    BigInteger,
     Column,
     DateTime,
     Enum,
-    Float,
     ForeignKey,
+    Index,
+    Integer,
     String,
     Table,
     create_engine,
@@ -17,6 +19,7 @@ from enum import Enum as PyEnum
 from uuid import UUID as PyUUID, uuid4
 from datetime import datetime
 from database import metadata
+from money import MAX_AMOUNT
 import sqlalchemy
 
 class UserRole(str, PyEnum):
@@ -41,6 +44,14 @@ class SplitMode(str, PyEnum):
     PERCENTAGE = "PERCENTAGE"
     AMOUNT = "AMOUNT"
 
+class ExportFormat(str, PyEnum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+class ChangeEntity(str, PyEnum):
+    TRANSACTION = "TRANSACTION"
+    MEMBER = "MEMBER"
+
 users = Table(
     "users",
     metadata,
@@ -59,6 +70,8 @@ groups = Table(
     Column("description", String),
     Column("createdAt", DateTime, server_default=func.now()),
     Column("createdBy", sqlalchemy.String, ForeignKey("users.id")),
+    # Bumped by every write to the group, its members or its transactions; drives caching and ETags
+    Column("ledgerVersion", Integer, nullable=False, server_default="0"),
 )
 
 members = Table(
@@ -70,6 +83,9 @@ members = Table(
     Column("role", Enum(UserRole), nullable=False),
     Column("joinedAt", DateTime, server_default=func.now()),
     Column("isActive", Boolean, server_default="true", nullable=False),
+    # Group ledger version of the last write to this row, for delta sync
+    Column("changeVersion", Integer, nullable=False, server_default="0"),
+    Index("ix_members_groupId_isActive", "groupId", "isActive"),
 )
 
 invitations = Table(
@@ -85,6 +101,9 @@ invitations = Table(
     Column("role", Enum(UserRole)),
     Column("status", Enum(InvitationStatus), default=InvitationStatus.PENDING),
     Column("createdAt", DateTime, server_default=func.now()),
+    Index("ix_invitations_groupId_status", "groupId", "status"),
+    Index("ix_invitations_inviteeEmail_status", "inviteeEmail", "status"),
+    Index("ix_invitations_inviteeId_status", "inviteeId", "status"),
 )
 
 transactions = Table(
@@ -93,13 +112,19 @@ transactions = Table(
     Column("id", sqlalchemy.String, primary_key=True, default=lambda: str(uuid4())),
     Column("groupId", sqlalchemy.String, ForeignKey("groups.id")),
     Column("type", Enum(TransactionType)),
-    Column("amount", Float),
+    # Money columns hold integer minor units, see money.py
+    Column("amount", BigInteger),
     Column("description", String),
     Column("date", DateTime(timezone=True), server_default=func.now()),
     Column("createdBy", String),
     Column("createdById", sqlalchemy.String, ForeignKey("users.id")),
     Column("payerId", sqlalchemy.String, ForeignKey("users.id")),
     Column("splitMode", Enum(SplitMode)),
+    # Group ledger version of the last write to this row or its splits, for delta sync
+    Column("changeVersion", Integer, nullable=False, server_default="0"),
+    Index("ix_transactions_groupId_date", "groupId", "date"),
+    Index("ix_transactions_payerId_groupId_date", "payerId", "groupId", "date"),
+    Index("ix_transactions_groupId_changeVersion", "groupId", "changeVersion"),
 )
 
 transaction_splits = Table(
@@ -107,8 +132,31 @@ transaction_splits = Table(
     metadata,
     Column("transactionId", sqlalchemy.String, ForeignKey("transactions.id"), primary_key=True),
     Column("userId", sqlalchemy.String, ForeignKey("users.id"), primary_key=True),
-    Column("amount", Float),
-    Column("percentage", Float),
+    Column("amount", BigInteger),
+    # Hundredths of a percent
+    Column("percentage", Integer),
+    Index("ix_transaction_splits_userId", "userId"),
+)
+
+member_balances = Table(
+    "member_balances",
+    metadata,
+    Column("groupId", sqlalchemy.String, ForeignKey("groups.id"), primary_key=True),
+    Column("userId", sqlalchemy.String, ForeignKey("users.id"), primary_key=True),
+    Column("balance", BigInteger, nullable=False, server_default="0"),
+)
+
+# Deleted transactions and removed members, so delta sync clients can drop them too
+tombstones = Table(
+    "tombstones",
+    metadata,
+    Column("id", sqlalchemy.String, primary_key=True, default=lambda: str(uuid4())),
+    Column("groupId", sqlalchemy.String, ForeignKey("groups.id"), nullable=False),
+    Column("entityType", Enum(ChangeEntity), nullable=False),
+    Column("entityId", String, nullable=False),
+    Column("changeVersion", Integer, nullable=False),
+    Column("deletedAt", DateTime, server_default=func.now()),
+    Index("ix_tombstones_groupId_changeVersion", "groupId", "changeVersion"),
 )
 
 
@@ -158,6 +206,9 @@ class Group(GroupBase):
     createdAt: datetime
     createdBy: str
     members: List["Member"] = []
+    memberCount: Optional[int] = None
+    transactionCount: Optional[int] = None
+    lastActivity: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -209,8 +260,11 @@ class TransactionSplitBase(BaseModel):
     amount: float
     percentage: Optional[float] = None
 
+# Amounts sent in must convert to minor units that fit the columns: no NaN or Infinity, no overflow
 class TransactionSplitCreate(TransactionSplitBase):
-    pass
+    # Only AMOUNT splits need one; the server computes EQUAL and PERCENTAGE amounts
+    amount: Optional[float] = Field(default=None, ge=0, le=MAX_AMOUNT, allow_inf_nan=False)
+    percentage: Optional[float] = Field(default=None, ge=0, le=100, allow_inf_nan=False)
 
 class TransactionSplit(TransactionSplitBase):
     pass
@@ -228,12 +282,40 @@ class TransactionBase(BaseModel):
     splits: List[TransactionSplitCreate]
 
 class TransactionCreate(TransactionBase):
-    pass
+    amount: float = Field(gt=0, le=MAX_AMOUNT, allow_inf_nan=False)
+    splits: List[TransactionSplitCreate] = []
+    # EQUAL splits can be sent as just the IDs of the members sharing the transaction
+    participantIds: Optional[List[str]] = None
 
-class TransactionUpdate(TransactionBase):
-    splits: Optional[List[TransactionSplitCreate]] = None
+class TransactionUpdate(TransactionCreate):
     date: Optional[datetime] = None
 
+class MemberBalance(BaseModel):
+    userId: str
+    username: str
+    balance: float
+
+class Settlement(BaseModel):
+    fromUserId: str
+    fromUsername: str
+    toUserId: str
+    toUsername: str
+    amount: float
+
+
+class TransactionImportRow(TransactionCreate):
+    date: Optional[datetime] = None
+
+class TransactionImportError(BaseModel):
+    row: int
+    detail: str
+
+class TransactionImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[TransactionImportError]
+
+
 class Transaction(TransactionBase):
     id: str
     groupId: str
@@ -243,4 +325,11 @@ class Transaction(TransactionBase):
     splits: List[TransactionSplit]
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class GroupChanges(BaseModel):
+    version: int
+    transactions: List[Transaction]
+    members: List[Member]
+    deletedTransactionIds: List[str]
+    deletedMemberIds: List[str]
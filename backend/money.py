@@ -0,0 +1,66 @@
+"""Money as exact integer minor units.
+
+Amounts and balances are stored and summed as integers (cents), and split
+percentages as hundredths of a percent, so totals add up exactly and stored
+balances never drift. The API keeps speaking decimal amounts: convert at the
+edges with ``to_minor_units`` and ``from_minor_units``.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import List, Optional, Sequence
+
+# Minor units per major unit, e.g. cents per dollar
+MINOR_UNITS = 100
+# Stored percentages are in hundredths of a percent, so 100% is 10000
+PERCENTAGE_SCALE = 100
+FULL_PERCENTAGE = 100 * PERCENTAGE_SCALE
+# Largest amount whose minor units still fit the BIGINT money columns
+MAX_AMOUNT = (2 ** 63 - 1) // MINOR_UNITS
+
+def _scale(value, factor: int) -> int:
+    # Go through str so binary float noise like 0.1 + 0.2 doesn't leak into the result
+    return int((Decimal(str(value)) * factor).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def to_minor_units(amount) -> int:
+    """Decimal amount to minor units, rounding half away from zero."""
+    return _scale(amount, MINOR_UNITS)
+
+def from_minor_units(minor: Optional[int]) -> Optional[float]:
+    return None if minor is None else minor / MINOR_UNITS
+
+def format_minor_units(minor: int) -> str:
+    """Exact decimal string for an amount in minor units, e.g. ``-1205`` gives ``-12.05``."""
+    major, minor_part = divmod(abs(minor), MINOR_UNITS)
+    return f"{'-' if minor < 0 else ''}{major}.{minor_part:0{len(str(MINOR_UNITS)) - 1}d}"
+
+def to_scaled_percentage(percentage) -> Optional[int]:
+    return None if percentage is None else _scale(percentage, PERCENTAGE_SCALE)
+
+def from_scaled_percentage(scaled: Optional[int]) -> Optional[float]:
+    return None if scaled is None else scaled / PERCENTAGE_SCALE
+
+def allocate_equal(total: int, count: int) -> List[int]:
+    """Split ``total`` minor units into ``count`` shares that differ by at most one unit.
+
+    The units left over go one each to the first shares, so the result depends
+    only on the order of the participants.
+    """
+    base, remainder = divmod(total, count)
+    return [base + 1] * remainder + [base] * (count - remainder)
+
+def allocate_by_weights(total: int, weights: Sequence[int]) -> List[int]:
+    """Split ``total`` minor units in proportion to integer ``weights``.
+
+    Each share is rounded down, then the units left over go to the shares with
+    the largest remainders, earlier shares first on ties (largest remainder
+    method). The shares always add up to ``total``.
+    """
+    weight_sum = sum(weights)
+    if weight_sum <= 0:
+        raise ValueError("Weights must add up to more than zero.")
+    quotients = [divmod(total * weight, weight_sum) for weight in weights]
+    shares = [share for share, _ in quotients]
+    leftover = total - sum(shares)
+    if leftover:
+        for index in sorted(range(len(weights)), key=lambda i: -quotients[i][1])[:leftover]:
+            shares[index] += 1
+    return shares
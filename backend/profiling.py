@@ -0,0 +1,286 @@
+"""Per-request query profiling.
+
+``QueryProfiler.instrument`` wraps the query methods of the shared
+``database``, and ``QueryProfilingMiddleware`` gives each request a profile
+that those calls record into: how many queries ran, how long they took and
+which were slowest. Each response gets a ``Server-Timing`` header, per-route
+latency histograms are served in the Prometheus text format at ``/metrics``,
+and ``/metrics/queries`` lists the slowest statements and the routes running
+the most queries when ``QUERY_METRICS_ENABLED`` is set.
+
+A request that runs more than ``QUERY_BUDGET`` queries is logged. With
+``QUERY_BUDGET_STRICT=1`` the query over budget raises instead, so tests fail
+on a new N+1 pattern.
+"""
+import bisect
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from typing import Optional
+
+# Queries a single request may run before it is reported; 0 turns the check off
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "25"))
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0").lower() in ("1", "true", "yes")
+# /metrics/queries shows SQL text, so it answers 404 unless turned on
+QUERY_METRICS_ENABLED = os.getenv("QUERY_METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+# Slowest statements kept per request and across the process
+SLOW_STATEMENTS_KEPT = int(os.getenv("SLOW_STATEMENTS_KEPT", "10"))
+
+# Upper bounds of the request latency histogram, in seconds
+REQUEST_LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Upper bounds of the queries per request histogram
+QUERIES_PER_REQUEST_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+QUERY_METHODS = ("execute", "execute_many", "fetch_all", "fetch_one", "fetch_val")
+
+request_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar("request_profile", default=None)
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+def statement_text(query, limit: int = 500) -> str:
+    # Only compiled when reported, never on the query path
+    text = " ".join(str(query).split())
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def query_budget(limit: int):
+    """Route dependency that gives a route its own query budget; 0 turns the check off."""
+    def set_budget():
+        profile = request_profile.get()
+        if profile is not None:
+            profile.budget = limit
+    return set_budget
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, budget: int, strict: bool):
+        self.method = method
+        self.path = path
+        self.budget = budget
+        self.strict = strict
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        # Min-heap of (seconds, sequence, query), so the fastest kept statement is dropped first
+        self.slowest = []
+        self._sequence = itertools.count()
+
+    def start_query(self):
+        self.queries += 1
+        if self.strict and self.budget and self.queries > self.budget:
+            raise QueryBudgetExceeded(f"{self.method} {self.path} ran more than {self.budget} queries.")
+
+    def finish_query(self, query, seconds: float):
+        self.db_seconds += seconds
+        entry = (seconds, next(self._sequence), query)
+        if len(self.slowest) < SLOW_STATEMENTS_KEPT:
+            heapq.heappush(self.slowest, entry)
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def server_timing(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        return f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries", app;dur={elapsed * 1000:.2f}'
+
+class RouteStats:
+    def __init__(self):
+        self.requests = 0
+        self.latency_seconds = 0.0
+        self.latency_counts = [0] * (len(REQUEST_LATENCY_BUCKETS_SECONDS) + 1)
+        self.queries = 0
+        self.max_queries = 0
+        self.query_counts = [0] * (len(QUERIES_PER_REQUEST_BUCKETS) + 1)
+        self.db_seconds = 0.0
+        self.over_budget = 0
+
+def _cumulative(bounds, counts):
+    total = 0
+    for bound, count in zip([*bounds, "+Inf"], counts):
+        total += count
+        yield str(bound), total
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class QueryProfiler:
+    """Records the queries each request runs and keeps per-route totals."""
+
+    def __init__(self, budget: int, strict: bool):
+        self.budget = budget
+        self.strict = strict
+        self.routes = {}
+        # Min-heap of (seconds, sequence, method, route, query) across all requests
+        self.slowest = []
+        self._sequence = itertools.count()
+
+    def instrument(self, database):
+        """Wrap the query methods of ``database`` so calls made during a request are recorded."""
+        for name in QUERY_METHODS:
+            setattr(database, name, self._timed(getattr(database, name)))
+        database.iterate = self._timed_iterate(database.iterate)
+
+    def _timed(self, method):
+        async def timed(query, *args, **kwargs):
+            profile = request_profile.get()
+            if profile is None:
+                return await method(query, *args, **kwargs)
+            profile.start_query()
+            started = time.perf_counter()
+            try:
+                return await method(query, *args, **kwargs)
+            finally:
+                profile.finish_query(query, time.perf_counter() - started)
+        return timed
+
+    def _timed_iterate(self, iterate):
+        async def timed_iterate(query, *args, **kwargs):
+            profile = request_profile.get()
+            if profile is None:
+                async for record in iterate(query, *args, **kwargs):
+                    yield record
+                return
+            profile.start_query()
+            # Only time spent waiting on the database counts, not the caller's work between rows
+            seconds = 0.0
+            records = iterate(query, *args, **kwargs).__aiter__()
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        record = await records.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        seconds += time.perf_counter() - started
+                    yield record
+            finally:
+                await records.aclose()
+                profile.finish_query(query, seconds)
+        return timed_iterate
+
+    def bind(self, operation):
+        """Attach ``operation`` to the current request's profile, for running it on another task."""
+        profile = request_profile.get()
+        if profile is None:
+            return operation
+
+        async def bound():
+            token = request_profile.set(profile)
+            try:
+                return await operation()
+            finally:
+                request_profile.reset(token)
+        return bound
+
+    def end(self, profile: RequestProfile, route: str):
+        elapsed = time.perf_counter() - profile.started
+        stats = self.routes.setdefault((profile.method, route), RouteStats())
+        stats.requests += 1
+        stats.latency_seconds += elapsed
+        stats.latency_counts[bisect.bisect_left(REQUEST_LATENCY_BUCKETS_SECONDS, elapsed)] += 1
+        stats.queries += profile.queries
+        stats.max_queries = max(stats.max_queries, profile.queries)
+        stats.query_counts[bisect.bisect_left(QUERIES_PER_REQUEST_BUCKETS, profile.queries)] += 1
+        stats.db_seconds += profile.db_seconds
+
+        for seconds, _, query in profile.slowest:
+            entry = (seconds, next(self._sequence), profile.method, route, query)
+            if len(self.slowest) < SLOW_STATEMENTS_KEPT:
+                heapq.heappush(self.slowest, entry)
+            elif seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+        if profile.budget and profile.queries > profile.budget:
+            stats.over_budget += 1
+            slowest = max(profile.slowest, key=lambda entry: entry[0], default=None)
+            detail = f" Slowest ({slowest[0] * 1000:.1f} ms): {statement_text(slowest[2], 200)}" if slowest else ""
+            print(f"WARNING: {profile.method} {route} ran {profile.queries} queries, over the budget of {profile.budget}.{detail}")
+
+    def metrics(self):
+        routes = sorted(self.routes.items(), key=lambda item: item[1].queries / item[1].requests, reverse=True)
+        return {
+            "queryBudget": self.budget or None,
+            "strict": self.strict,
+            "routes": [
+                {
+                    "method": method,
+                    "route": route,
+                    "requests": stats.requests,
+                    "avgQueries": round(stats.queries / stats.requests, 2),
+                    "maxQueries": stats.max_queries,
+                    "avgDbMs": round(stats.db_seconds / stats.requests * 1000, 2),
+                    "avgLatencyMs": round(stats.latency_seconds / stats.requests * 1000, 2),
+                    "overBudget": stats.over_budget,
+                }
+                for (method, route), stats in routes
+            ],
+            "slowestStatements": [
+                {"ms": round(seconds * 1000, 2), "method": method, "route": route, "sql": statement_text(query)}
+                for seconds, _, method, route, query in sorted(self.slowest, key=lambda entry: entry[0], reverse=True)
+            ],
+        }
+
+    def prometheus(self) -> str:
+        """Per-route request metrics in the Prometheus text exposition format."""
+        lines = []
+        families = [
+            ("http_request_duration_seconds", "histogram", "Time to handle a request.",
+             REQUEST_LATENCY_BUCKETS_SECONDS, lambda stats: (stats.latency_counts, stats.latency_seconds)),
+            ("http_request_db_queries", "histogram", "Database queries run by a request.",
+             QUERIES_PER_REQUEST_BUCKETS, lambda stats: (stats.query_counts, stats.queries)),
+        ]
+        for name, kind, description, bounds, values in families:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            for (method, route), stats in self.routes.items():
+                labels = f'method="{_label(method)}",route="{_label(route)}"'
+                counts, total = values(stats)
+                for bound, count in _cumulative(bounds, counts):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {total}")
+                lines.append(f"{name}_count{{{labels}}} {stats.requests}")
+
+        counters = [
+            ("http_request_db_seconds_total", "Time requests spent waiting on database queries.", lambda stats: stats.db_seconds),
+            ("http_request_over_query_budget_total", "Requests that ran more queries than the budget.", lambda stats: stats.over_budget),
+        ]
+        for name, description, value in counters:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+            for (method, route), stats in self.routes.items():
+                lines.append(f'{name}{{method="{_label(method)}",route="{_label(route)}"}} {value(stats)}')
+        return "\n".join(lines) + "\n"
+
+query_profiler = QueryProfiler(QUERY_BUDGET, QUERY_BUDGET_STRICT)
+
+class QueryProfilingMiddleware:
+    """Profiles each HTTP request and adds a ``Server-Timing`` header to its response.
+
+    The header is written when the response starts, so queries a streaming
+    response runs afterwards only show up in the metrics.
+    """
+
+    def __init__(self, app, profiler: QueryProfiler = query_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"], self.profiler.budget, self.profiler.strict)
+        token = request_profile.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_profile.reset(token)
+            # Set by FastAPI once the request is routed; the template keeps the label count bounded
+            route = scope.get("route")
+            self.profiler.end(profile, getattr(route, "path", "unmatched"))
@@ -0,0 +1,111 @@
+"""Pub/sub for live group updates.
+
+Writers publish a small event after their DB transaction commits; every open
+``/groups/{groupId}/events`` stream for that group receives it, in whichever
+worker it is served (see ``backplane``). Events only say what changed and at
+which ledger version; clients fetch the data itself through
+``/groups/{groupId}/changes``.
+"""
+import asyncio
+import os
+from collections import OrderedDict, defaultdict
+from typing import Optional
+from backplane import message_bus
+
+EVENT_MAX_PENDING = int(os.getenv("EVENT_MAX_PENDING", "256"))
+EVENT_COALESCE_SECONDS = float(os.getenv("EVENT_COALESCE_SECONDS", "0.05"))
+
+class Subscription:
+    """One client's pending events.
+
+    Events for the same entity replace each other, so a burst of edits to one
+    transaction is delivered once. A subscriber that falls more than
+    ``max_pending`` distinct entities behind is dropped instead of buffered.
+    """
+
+    def __init__(self, groupId: str, userId: str, max_pending: int):
+        self.groupId = groupId
+        self.userId = userId
+        self.max_pending = max_pending
+        self.dropped = False
+        self._pending = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def drop(self):
+        self.dropped = True
+        self._pending.clear()
+        self._ready.set()
+
+    def offer(self, event: dict):
+        key = (event["entity"], event["id"])
+        self._pending.pop(key, None)
+        self._pending[key] = event
+        if len(self._pending) > self.max_pending:
+            self.drop()
+        else:
+            self._ready.set()
+
+    async def next_batch(self, timeout: float, coalesce_seconds: float = EVENT_COALESCE_SECONDS):
+        """Wait up to ``timeout`` for events, then give the burst a moment to settle and return it."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        if coalesce_seconds and not self.dropped:
+            await asyncio.sleep(coalesce_seconds)
+        batch = list(self._pending.values())
+        self._pending.clear()
+        self._ready.clear()
+        return batch
+
+EVENTS_CHANNEL = "group.events"
+
+class GroupEventBus:
+    def __init__(self, max_pending: int, bus=message_bus):
+        self.max_pending = max_pending
+        self.bus = bus
+        self._subscribers = defaultdict(set)
+        self.dropped = 0
+        bus.subscribe(EVENTS_CHANNEL, self._deliver)
+        bus.on_reset(self._drop_all)
+
+    def subscribe(self, groupId: str, userId: str) -> Subscription:
+        subscription = Subscription(groupId, userId, self.max_pending)
+        self._subscribers[groupId].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        group_subscribers = self._subscribers.get(subscription.groupId)
+        if group_subscribers is not None:
+            group_subscribers.discard(subscription)
+            if not group_subscribers:
+                del self._subscribers[subscription.groupId]
+
+    def publish(self, groupId: str, entity: str, action: str, id: Optional[str], version: Optional[int]):
+        """Queue an event for every subscriber of the group, in every worker. Call only after the write has committed."""
+        self.bus.publish(EVENTS_CHANNEL, {"groupId": groupId, "entity": entity, "action": action, "id": id, "version": version})
+
+    def _deliver(self, message: dict):
+        event = {key: message[key] for key in ("entity", "action", "id", "version")}
+        for subscription in list(self._subscribers.get(message["groupId"], ())):
+            subscription.offer(event)
+            if subscription.dropped:
+                self.dropped += 1
+                self.unsubscribe(subscription)
+
+    def _drop_all(self):
+        # Events may have been missed, so every client must resync
+        for group_subscribers in list(self._subscribers.values()):
+            for subscription in list(group_subscribers):
+                subscription.drop()
+                self.dropped += 1
+                self.unsubscribe(subscription)
+
+    def metrics(self):
+        return {
+            "groups": len(self._subscribers),
+            "subscribers": sum(len(group_subscribers) for group_subscribers in self._subscribers.values()),
+            "dropped": self.dropped,
+        }
+
+group_events = GroupEventBus(EVENT_MAX_PENDING)
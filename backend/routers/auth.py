@@ -2,9 +2,9 @@ import sqlite3
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from database import database
+from database import database, run_in_transaction
 from models import users, User, UserCreate, Token
-from security import get_password_hash, verify_password, create_access_token, get_current_user, get_supabase_user_claims
+from security import get_password_hash, verify_password, create_access_token, get_current_user, get_supabase_user_claims, invalidate_cached_user
 from datetime import timedelta
 from uuid import uuid4
 
@@ -19,9 +19,9 @@ async def register_user(user: UserCreate):
         raise HTTPException(status_code=400, detail="Username or email already exists")
     
     user_id = str(uuid4())
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     query = users.insert().values(id=user_id, username=user.username, email=user.email, hashed_password=hashed_password)
-    await database.execute(query)
+    await run_in_transaction(lambda: database.execute(query))
     return {**user.dict(), "id": user_id}
 
 
@@ -29,7 +29,7 @@ async def register_user(user: UserCreate):
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     query = users.select().where(users.c.email == form_data.username) # form_data.username is the email
     user = await database.fetch_one(query)
-    if not user or not verify_password(form_data.password, user["hashed_password"]):
+    if not user or not await verify_password(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -77,7 +77,8 @@ async def sync_user_with_supabase(supabase_claims: dict = Depends(get_supabase_u
 
         if update_data:
             update_query = users.update().where(users.c.id == existing_user["id"]).values(**update_data)
-            await database.execute(update_query)
+            await run_in_transaction(lambda: database.execute(update_query))
+            invalidate_cached_user(supabase_user_id)
         
         # Fetch the potentially updated user to return
         updated_user = await database.fetch_one(query)
@@ -105,7 +106,7 @@ async def sync_user_with_supabase(supabase_claims: dict = Depends(get_supabase_u
         )
         
         try:
-            await database.execute(insert_query)
+            await run_in_transaction(lambda: database.execute(insert_query))
         except (sqlite3.IntegrityError, Exception) as e: # Catch IntegrityError for race conditions
             # This handles the race condition: another request created the user
             # just after our SELECT check. We can now fetch the user that should exist.
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Depends, Request, Response
+from typing import List
+from sqlalchemy import func, select
+from authorization import GroupMembership, get_group_membership
+from database import database
+from etags import conditional_response, group_etag
+from money import from_minor_units
+from models import MemberBalance, Settlement, members, member_balances
+
+router = APIRouter()
+
+async def compute_member_balances(groupId: str):
+    """Balances of the group's active members, in minor units."""
+    # Stored balances are kept current by every ledger write, so this is a keyed lookup
+    query = select(
+        members.c.userId,
+        members.c.username,
+        func.coalesce(member_balances.c.balance, 0).label("balance"),
+    ).select_from(
+        members.outerjoin(
+            member_balances,
+            (member_balances.c.groupId == members.c.groupId) & (member_balances.c.userId == members.c.userId),
+        )
+    ).where((members.c.groupId == groupId) & (members.c.isActive == True))
+    return [
+        {"userId": row["userId"], "username": row["username"], "balance": row["balance"]}
+        for row in await database.fetch_all(query)
+    ]
+
+def calculate_settlements(balances):
+    """Greedy minimum cash flow: repeatedly match the largest debtor with the largest creditor.
+
+    Balances and the resulting amounts are in minor units, so settled means exactly zero.
+    """
+    creditors = sorted(
+        ([mb["userId"], mb["username"], mb["balance"]] for mb in balances if mb["balance"] > 0),
+        key=lambda mb: mb[2], reverse=True,
+    )
+    debtors = sorted(
+        ([mb["userId"], mb["username"], mb["balance"]] for mb in balances if mb["balance"] < 0),
+        key=lambda mb: mb[2],
+    )
+
+    settlements = []
+    i = j = 0
+    while i < len(debtors) and j < len(creditors):
+        debtor, creditor = debtors[i], creditors[j]
+        amount = min(-debtor[2], creditor[2])
+        settlements.append({
+            "fromUserId": debtor[0],
+            "fromUsername": debtor[1],
+            "toUserId": creditor[0],
+            "toUsername": creditor[1],
+            "amount": amount,
+        })
+        debtor[2] += amount
+        creditor[2] -= amount
+        if debtor[2] == 0:
+            i += 1
+        if creditor[2] == 0:
+            j += 1
+    return settlements
+
+@router.get("/{groupId}/balances", response_model=List[MemberBalance])
+async def get_group_balances(groupId: str, request: Request, response: Response, membership: GroupMembership = Depends(get_group_membership)):
+    not_modified = conditional_response(request, response, group_etag(groupId, membership.version, "balances"))
+    if not_modified:
+        return not_modified
+    return [{**mb, "balance": from_minor_units(mb["balance"])} for mb in await compute_member_balances(groupId)]
+
+@router.get("/{groupId}/settlements", response_model=List[Settlement])
+async def get_group_settlements(groupId: str, request: Request, response: Response, membership: GroupMembership = Depends(get_group_membership)):
+    not_modified = conditional_response(request, response, group_etag(groupId, membership.version, "settlements"))
+    if not_modified:
+        return not_modified
+    return [
+        {**settlement, "amount": from_minor_units(settlement["amount"])}
+        for settlement in calculate_settlements(await compute_member_balances(groupId))
+    ]
@@ -0,0 +1,55 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from authorization import GroupMembership, get_group_membership
+from database import database
+from models import GroupChanges, ChangeEntity, members, tombstones, transactions
+from routers.transactions import attach_splits
+
+router = APIRouter()
+
+@router.get("/{groupId}/changes", response_model=GroupChanges)
+async def get_group_changes(
+    groupId: str,
+    since: Optional[int] = Query(None, ge=0),
+    membership: GroupMembership = Depends(get_group_membership),
+):
+    """Transactions and members written, and ids deleted, after ledger version ``since``.
+
+    Splits travel with their transaction: any change to them re-stamps it. Omit
+    ``since`` for a full snapshot, then pass the returned ``version`` next time.
+    Rows are read after the version, so a write racing this request may show up
+    again in the next delta, but never goes missing.
+    """
+    version = membership.version
+    if since is not None and since > version:
+        raise HTTPException(status_code=400, detail="since is ahead of the group's current version")
+
+    transaction_condition = transactions.c.groupId == groupId
+    member_condition = members.c.groupId == groupId
+    if since is not None:
+        transaction_condition &= transactions.c.changeVersion > since
+        member_condition &= members.c.changeVersion > since
+
+    changed_transactions = await attach_splits(
+        await database.fetch_all(transactions.select().where(transaction_condition).order_by(transactions.c.date, transactions.c.id)),
+        transaction_condition,
+    )
+    changed_members = await database.fetch_all(members.select().where(member_condition))
+
+    deleted = {ChangeEntity.TRANSACTION: set(), ChangeEntity.MEMBER: set()}
+    if since is not None:
+        tombstone_query = tombstones.select().where(
+            (tombstones.c.groupId == groupId) & (tombstones.c.changeVersion > since)
+        )
+        for tombstone in await database.fetch_all(tombstone_query):
+            deleted[tombstone["entityType"]].add(tombstone["entityId"])
+    # A member removed and later re-added is live again
+    deleted[ChangeEntity.MEMBER] -= {member["userId"] for member in changed_members}
+
+    return {
+        "version": version,
+        "transactions": changed_transactions,
+        "members": changed_members,
+        "deletedTransactionIds": sorted(deleted[ChangeEntity.TRANSACTION]),
+        "deletedMemberIds": sorted(deleted[ChangeEntity.MEMBER]),
+    }
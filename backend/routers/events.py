@@ -0,0 +1,53 @@
+import json
+import os
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from authorization import GroupMembership, get_group_membership
+from pubsub import group_events
+
+router = APIRouter()
+
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_group_events(subscription, version: int):
+    try:
+        yield format_sse("ready", {"version": version})
+        while True:
+            batch = await subscription.next_batch(EVENT_HEARTBEAT_SECONDS)
+            if subscription.dropped:
+                # Too far behind: the client should resync through /changes and reconnect
+                yield format_sse("reset", {})
+                return
+            if not batch:
+                # Keeps proxies from closing an idle stream and surfaces disconnected clients
+                yield ": heartbeat\n\n"
+                continue
+            for event in batch:
+                yield format_sse("change", event)
+            if any(
+                (event["entity"] == "group" and event["action"] == "deleted") or
+                (event["entity"] == "member" and event["action"] == "removed" and event["id"] == subscription.userId)
+                for event in batch
+            ):
+                return
+    finally:
+        group_events.unsubscribe(subscription)
+
+@router.get("/{groupId}/events")
+async def get_group_events(groupId: str, membership: GroupMembership = Depends(get_group_membership)):
+    """Server-Sent Events stream of changes to the group.
+
+    Starts with a ``ready`` event carrying the current ledger version, then sends
+    one ``change`` event per changed entity. Bursts are coalesced, and a client
+    that falls behind gets ``reset`` and is disconnected. The stream ends when the
+    group is deleted or the user leaves it.
+    """
+    subscription = group_events.subscribe(groupId, membership.member["userId"])
+    return StreamingResponse(
+        stream_group_events(subscription, membership.version),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,28 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import defaultdict
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import case, func, select
 from typing import List
-from database import database
-from models import groups, members, Group, GroupCreate, GroupUpdate, User, Invitation, MemberCreate, MemberUpdate, InvitationStatus, UserRole, users, invitations, transactions, transaction_splits
+from authorization import GroupMembership, get_group_membership, invalidate_group_access, load_group_access, require_group_role
+from database import database, run_in_transaction
+from etags import conditional_response, group_etag
+from ledger import bump_ledger_version, move_balances, record_tombstones
+from models import groups, members, tombstones, ChangeEntity, Group, GroupCreate, GroupUpdate, User, Invitation, MemberCreate, MemberUpdate, InvitationStatus, UserRole, users, invitations, transactions, transaction_splits, member_balances
+from pubsub import group_events
 from security import get_current_user
 from uuid import uuid4
 
 router = APIRouter()
 
+require_group_owner_to_delete = require_group_role((UserRole.OWNER,), "Only the group owner can delete the group.")
+require_group_owner_to_edit = require_group_role((UserRole.OWNER,), "Only the group owner can edit the group.")
+require_member_inviter = require_group_role((UserRole.OWNER, UserRole.ADMIN), "Not authorized to add/invite members to this group")
+require_member_remover = require_group_role((UserRole.OWNER, UserRole.ADMIN), "Only group owners and admins can remove members.")
+
 @router.get("/", response_model=List[Group])
-async def get_groups_for_current_user(current_user: User = Depends(get_current_user)):
-    query = groups.select().where(groups.c.id.in_(
-        members.select().where(
-            (members.c.userId == current_user.id) & (members.c.isActive == True)
-        ).with_only_columns(members.c.groupId)
-    ))
+async def get_groups_for_current_user(summary: bool = False, current_user: User = Depends(get_current_user)):
+    user_group_ids = members.select().where(
+        (members.c.userId == current_user.id) & (members.c.isActive == True)
+    ).with_only_columns(members.c.groupId)
+
+    query = groups.select().where(groups.c.id.in_(user_group_ids))
     user_groups = await database.fetch_all(query)
-    
-    # For each group, fetch its active members
+    if not user_groups:
+        return []
+
+    # Fetch the active members of all the groups at once
+    members_query = members.select().where(
+        members.c.groupId.in_(user_group_ids) & (members.c.isActive == True)
+    )
+    members_by_group = defaultdict(list)
+    for member in await database.fetch_all(members_query):
+        members_by_group[member["groupId"]].append(member)
+
+    activity_by_group = {}
+    if summary:
+        activity_query = select(
+            transactions.c.groupId,
+            func.count(transactions.c.id).label("transactionCount"),
+            func.max(transactions.c.date).label("lastActivity"),
+        ).where(transactions.c.groupId.in_(user_group_ids)).group_by(transactions.c.groupId)
+        activity_by_group = {row["groupId"]: row for row in await database.fetch_all(activity_query)}
+
     groups_with_members = []
     for group in user_groups:
-        members_query = members.select().where((members.c.groupId == group["id"]) & (members.c.isActive == True))
-        group_members = await database.fetch_all(members_query)
-        groups_with_members.append({**group, "members": group_members})
-        
+        group_members = members_by_group[group["id"]]
+        group_data = {**group, "members": group_members}
+        if summary:
+            activity = activity_by_group.get(group["id"])
+            group_data.update(
+                memberCount=len(group_members),
+                transactionCount=activity["transactionCount"] if activity else 0,
+                lastActivity=activity["lastActivity"] if activity else None,
+            )
+        groups_with_members.append(group_data)
+
     return groups_with_members
 
 @router.post("/", response_model=Group, status_code=status.HTTP_201_CREATED)
@@ -35,32 +71,27 @@ async def create_new_group(group: GroupCreate, current_user: User = Depends(get_
         raise HTTPException(status_code=400, detail="You already have a group with this name.")
 
     group_id = str(uuid4())
-    query = groups.insert().values(
-        id=group_id,
-        name=group.name,
-        description=group.description,
-        createdBy=current_user.id
-    )
-    await database.execute(query)
-    
-    # Add the creator as the owner of the group
-    member_query = members.insert().values(
-        userId=current_user.id,
-        groupId=group_id,
-        username=current_user.username,
-        role="OWNER",
-        isActive=True
-    )
-    await database.execute(member_query)
 
-    # Fetch the newly created group and member to return
-    new_group_query = groups.select().where(groups.c.id == group_id)
-    new_group = await database.fetch_one(new_group_query)
+    async def write():
+        query = groups.insert().values(
+            id=group_id,
+            name=group.name,
+            description=group.description,
+            createdBy=current_user.id
+        ).returning(*groups.c)
+        new_group = await database.fetch_one(query)
+
+        # Add the creator as the owner of the group
+        member_query = members.insert().values(
+            userId=current_user.id,
+            groupId=group_id,
+            username=current_user.username,
+            role="OWNER",
+            isActive=True
+        ).returning(*members.c)
+        return new_group, await database.fetch_one(member_query)
 
-    new_member_query = members.select().where(
-        (members.c.groupId == group_id) & (members.c.userId == current_user.id)
-    )
-    new_member = await database.fetch_one(new_member_query)
+    new_group, new_member = await run_in_transaction(write)
 
     return {
         "id": new_group["id"],
@@ -72,34 +103,15 @@ async def create_new_group(group: GroupCreate, current_user: User = Depends(get_
     }
 
 @router.get("/{groupId}", response_model=Group)
-async def get_group_details(groupId: str, current_user: User = Depends(get_current_user)):
-    query = groups.select().where(groups.c.id == groupId)
-    group = await database.fetch_one(query)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    # Check if the current user is a member of the group
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    if not await database.fetch_one(member_query):
-        raise HTTPException(status_code=403, detail="Not authorized to access this group")
-
-    # Get all active members of the group
-    members_query = members.select().where((members.c.groupId == groupId) & (members.c.isActive == True))
-    group_members = await database.fetch_all(members_query)
-
-    return {**group, "members": group_members}
+async def get_group_details(groupId: str, request: Request, response: Response, membership: GroupMembership = Depends(get_group_membership)):
+    # The body and the ETag come from the same read, at membership.version
+    not_modified = conditional_response(request, response, group_etag(groupId, membership.version, "group"))
+    if not_modified:
+        return not_modified
+    return {**membership.group, "members": membership.active_members()}
 
 @router.get("/{groupId}/invitations", response_model=List[Invitation])
-async def get_pending_invitations_for_group(groupId: str, current_user: User = Depends(get_current_user)):
-    # Check if user is a member of the group
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    if not await database.fetch_one(member_query):
-        raise HTTPException(status_code=403, detail="Not authorized to access this group's invitations")
-    
+async def get_pending_invitations_for_group(groupId: str, membership: GroupMembership = Depends(get_group_membership)):
     query = invitations.select().where(
         (invitations.c.groupId == groupId) &
         (invitations.c.status == InvitationStatus.PENDING)
@@ -107,20 +119,13 @@ async def get_pending_invitations_for_group(groupId: str, current_user: User = D
     return await database.fetch_all(query)
 
 @router.post("/{groupId}/members", response_model=Group)
-async def add_or_invite_member_to_group(groupId: str, member_data: MemberCreate, current_user: User = Depends(get_current_user)):
-    # Check if group exists
-    group_query = groups.select().where(groups.c.id == groupId)
-    group = await database.fetch_one(group_query)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    # Check if current user has permission to add/invite members (e.g., ADMIN or OWNER)
-    current_user_member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    current_user_member = await database.fetch_one(current_user_member_query)
-    if not current_user_member or current_user_member["role"] not in ["OWNER", "ADMIN"]:
-        raise HTTPException(status_code=403, detail="Not authorized to add/invite members to this group")
+async def add_or_invite_member_to_group(
+    groupId: str,
+    member_data: MemberCreate,
+    membership: GroupMembership = Depends(require_member_inviter),
+    current_user: User = Depends(get_current_user),
+):
+    group = membership.group
 
     # Handle GUEST role - directly add as member
     if member_data.role == UserRole.GUEST:
@@ -135,22 +140,31 @@ async def add_or_invite_member_to_group(groupId: str, member_data: MemberCreate,
         dummy_user_id = str(uuid4()) # Generate a new UUID for the guest user
         dummy_email = f"{member_data.identifier.replace(' ', '_').lower()}@{groupId}.guest"
         unique_guest_username = f"{member_data.identifier.replace(' ', '_').lower()}-{str(uuid4())[:8]}"
-        insert_dummy_user_query = users.insert().values(
-            id=dummy_user_id,
-            username=unique_guest_username,
-            email=dummy_email,
-            hashed_password="" # No password for guest
-        )
-        await database.execute(insert_dummy_user_query)
 
-        insert_member_query = members.insert().values(
-            userId=dummy_user_id,
-            groupId=groupId,
-            username=member_data.identifier,
-            role=UserRole.GUEST,
-            isActive=True
-        )
-        await database.execute(insert_member_query)
+        async def write():
+            version = await bump_ledger_version(groupId)
+            insert_dummy_user_query = users.insert().values(
+                id=dummy_user_id,
+                username=unique_guest_username,
+                email=dummy_email,
+                hashed_password="" # No password for guest
+            )
+            await database.execute(insert_dummy_user_query)
+
+            insert_member_query = members.insert().values(
+                userId=dummy_user_id,
+                groupId=groupId,
+                username=member_data.identifier,
+                role=UserRole.GUEST,
+                isActive=True,
+                changeVersion=version
+            )
+            await database.execute(insert_member_query)
+            return version
+
+        version = await run_in_transaction(write)
+        invalidate_group_access(groupId)
+        group_events.publish(groupId, "member", "added", dummy_user_id, version)
         # Fetch updated group with new member
         updated_group_members_query = members.select().where(members.c.groupId == groupId)
         updated_group_members = await database.fetch_all(updated_group_members_query)
@@ -190,105 +204,133 @@ async def add_or_invite_member_to_group(groupId: str, member_data: MemberCreate,
             role=member_data.role,
             status=InvitationStatus.PENDING
         )
-        await database.execute(insert_invitation_query)
+        await run_in_transaction(lambda: database.execute(insert_invitation_query))
         
         updated_group_members_query = members.select().where(members.c.groupId == groupId)
         updated_group_members = await database.fetch_all(updated_group_members_query)
         return {**group, "members": updated_group_members}
 
 @router.delete("/{groupId}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_group(groupId: str, current_user: User = Depends(get_current_user)):
-    # Check if group exists
-    group_query = groups.select().where(groups.c.id == groupId)
-    group = await database.fetch_one(group_query)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    # Check if current user is the OWNER
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    member = await database.fetch_one(member_query)
-    if not member or member["role"] != UserRole.OWNER:
-        raise HTTPException(status_code=403, detail="Only the group owner can delete the group.")
-
+async def delete_group(groupId: str, membership: GroupMembership = Depends(require_group_owner_to_delete)):
     # Delete associated data
     # Note: Foreign key constraints should handle cascading deletes if set up properly in the DB schema.
     # However, to be explicit and safe, we delete from child tables first.
+    group_transaction_ids = select(transactions.c.id).where(transactions.c.groupId == groupId)
 
-    # Get all transaction IDs for the group
-    transactions_in_group_query = transactions.select().where(transactions.c.groupId == groupId).with_only_columns(transactions.c.id)
-    transaction_ids = [row[0] for row in await database.fetch_all(transactions_in_group_query)]
+    async def write():
+        # Lock the group row first so in-flight writes to the group finish before it goes
+        await bump_ledger_version(groupId)
 
-    if transaction_ids:
-        # Delete from transaction_splits
-        delete_splits_query = transaction_splits.delete().where(transaction_splits.c.transactionId.in_(transaction_ids))
-        await database.execute(delete_splits_query)
-
-        # Delete from transactions
-        delete_transactions_query = transactions.delete().where(transactions.c.id.in_(transaction_ids))
-        await database.execute(delete_transactions_query)
-    
-    # Delete from invitations
-    delete_invitations_query = invitations.delete().where(invitations.c.groupId == groupId)
-    await database.execute(delete_invitations_query)
-    
-    # Delete from members
-    delete_members_query = members.delete().where(members.c.groupId == groupId)
-    await database.execute(delete_members_query)
+        # Delete from transaction_splits and transactions
+        await database.execute(transaction_splits.delete().where(transaction_splits.c.transactionId.in_(group_transaction_ids)))
+        await database.execute(transactions.delete().where(transactions.c.groupId == groupId))
 
-    # Finally, delete the group
-    delete_group_query = groups.delete().where(groups.c.id == groupId)
-    await database.execute(delete_group_query)
+        # Delete stored balances and sync tombstones
+        await database.execute(tombstones.delete().where(tombstones.c.groupId == groupId))
+        await database.execute(member_balances.delete().where(member_balances.c.groupId == groupId))
 
-@router.put("/{groupId}", response_model=Group)
-async def update_group(groupId: str, group_data: GroupUpdate, current_user: User = Depends(get_current_user)):
-    # Check if group exists
-    group_query = groups.select().where(groups.c.id == groupId)
-    group = await database.fetch_one(group_query)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    # Check if current user is the OWNER
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    member = await database.fetch_one(member_query)
-    if not member or member["role"] != UserRole.OWNER:
-        raise HTTPException(status_code=403, detail="Only the group owner can edit the group.")
+        # Delete from invitations and members
+        await database.execute(invitations.delete().where(invitations.c.groupId == groupId))
+        await database.execute(members.delete().where(members.c.groupId == groupId))
 
-    # Update group data
-    update_data = group_data.dict(exclude_unset=True)
-    update_query = groups.update().where(groups.c.id == groupId).values(**update_data)
-    await database.execute(update_query)
+        # Finally, delete the group
+        await database.execute(groups.delete().where(groups.c.id == groupId))
 
-    # Fetch and return the updated group
-    updated_group_query = groups.select().where(groups.c.id == groupId)
-    updated_group = await database.fetch_one(updated_group_query)
+    await run_in_transaction(write)
 
-    members_query = members.select().where(members.c.groupId == groupId)
-    group_members = await database.fetch_all(members_query)
+    invalidate_group_access(groupId)
+    group_events.publish(groupId, "group", "deleted", groupId, None)
 
-    return {**updated_group, "members": group_members}
+@router.put("/{groupId}", response_model=Group)
+async def update_group(groupId: str, group_data: GroupUpdate, membership: GroupMembership = Depends(require_group_owner_to_edit)):
+    # Update group data
+    update_data = group_data.dict(exclude_unset=True)
+    update_query = groups.update().where(groups.c.id == groupId).values(
+        **update_data, ledgerVersion=groups.c.ledgerVersion + 1
+    ).returning(*groups.c)
+    updated_group = await run_in_transaction(lambda: database.fetch_one(update_query))
+    invalidate_group_access(groupId)
+    group_events.publish(groupId, "group", "updated", groupId, updated_group["ledgerVersion"])
+
+    # Renaming leaves the members as they were read, unless another write has landed since
+    access = membership.access
+    if updated_group["ledgerVersion"] != membership.version + 1:
+        access = await load_group_access(groupId)
+    return {**updated_group, "members": access.active_members()}
+
+async def replace_member_with_guest_user(groupId: str, original_user_id: str, original_username: str):
+    """Replace a member with a new guest user who takes over their records in this group.
+
+    Everything runs in one DB transaction, and only rows belonging to this group
+    are rewritten, so the user's records in other groups are left alone. Returns
+    the new ledger version and the guest's member row.
+    """
+    guest_user_id = str(uuid4())
+    guest_username_unique = f"{original_username}-{guest_user_id[:8]}" # Make username globally unique
+    guest_email = f"{original_username.replace(' ', '_').lower()}.{groupId[:8]}@guest.kanak"
+    group_transaction_ids = select(transactions.c.id).where(transactions.c.groupId == groupId)
+
+    async def write():
+        version = await bump_ledger_version(groupId)
+
+        # 1. Create a new virtual guest user
+        await database.execute(users.insert().values(
+            id=guest_user_id,
+            username=guest_username_unique,
+            email=guest_email,
+            hashed_password=""
+        ))
+
+        # 2. Re-assign the group's financial records to the new guest user
+        await database.execute(transaction_splits.update().where(
+            (transaction_splits.c.userId == original_user_id) &
+            transaction_splits.c.transactionId.in_(group_transaction_ids)
+        ).values(userId=guest_user_id))
+
+        # Also stamps transactions whose splits were just moved, so delta sync picks them up
+        guest_split_transaction_ids = select(transaction_splits.c.transactionId).where(transaction_splits.c.userId == guest_user_id)
+        await database.execute(transactions.update().where(
+            (transactions.c.groupId == groupId) & (
+                (transactions.c.payerId == original_user_id) |
+                (transactions.c.createdById == original_user_id) |
+                transactions.c.id.in_(guest_split_transaction_ids)
+            )
+        ).values(
+            payerId=case((transactions.c.payerId == original_user_id, guest_user_id), else_=transactions.c.payerId),
+            createdById=case((transactions.c.createdById == original_user_id, guest_user_id), else_=transactions.c.createdById),
+            changeVersion=version,
+        ))
+
+        await move_balances(groupId, original_user_id, guest_user_id)
+
+        # 3. Swap the original member for the guest, keeping the original name for display
+        await database.execute(members.delete().where(
+            (members.c.groupId == groupId) & (members.c.userId == original_user_id)
+        ))
+        await record_tombstones(groupId, ChangeEntity.MEMBER, [original_user_id], version)
+        guest_member = await database.fetch_one(members.insert().values(
+            userId=guest_user_id,
+            groupId=groupId,
+            username=original_username,
+            role=UserRole.GUEST,
+            isActive=True,
+            changeVersion=version
+        ).returning(*members.c))
+        return version, guest_member
 
-    return {**updated_group, "members": group_members}
+    version, guest_member = await run_in_transaction(write)
+    invalidate_group_access(groupId)
+    group_events.publish(groupId, "member", "removed", original_user_id, version)
+    group_events.publish(groupId, "member", "added", guest_user_id, version)
+    return version, guest_member
 
 @router.put("/{groupId}/members/{memberId}/replace-with-guest", response_model=Group)
-async def replace_member_with_guest(groupId: str, memberId: str, current_user: User = Depends(get_current_user)):
-    # Check if group exists
-    group_query = groups.select().where(groups.c.id == groupId)
-    group = await database.fetch_one(group_query)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    # Authorize action: only OWNER or ADMIN
-    current_user_member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    current_user_member = await database.fetch_one(current_user_member_query)
-    if not current_user_member or current_user_member["role"] not in [UserRole.OWNER, UserRole.ADMIN]:
-        raise HTTPException(status_code=403, detail="Only group owners and admins can remove members.")
-
+async def replace_member_with_guest(
+    groupId: str,
+    memberId: str,
+    membership: GroupMembership = Depends(require_member_remover),
+    current_user: User = Depends(get_current_user),
+):
     # Get target member info
     target_member_query = members.select().where(
         (members.c.groupId == groupId) & (members.c.userId == memberId)
@@ -305,140 +347,27 @@ async def replace_member_with_guest(groupId: str, memberId: str, current_user: U
     if target_member["role"] == UserRole.GUEST:
         raise HTTPException(status_code=400, detail="Cannot remove a guest member directly. Guest members are created when a user leaves or is removed.")
 
-    # --- Start Replacement Process ---
-    original_user_id = target_member["userId"]
-    original_username = target_member["username"]
-    group_id_short = groupId[:8]
-
-    # 1. Create a new virtual guest user
-    guest_user_id = str(uuid4())
-    guest_username_unique = f"{original_username}-{guest_user_id[:8]}" # Make username globally unique
-    guest_email = f"{original_username.replace(' ', '_').lower()}.{group_id_short}@guest.kanak"
-    insert_guest_user_query = users.insert().values(
-        id=guest_user_id,
-        username=guest_username_unique,
-        email=guest_email,
-        hashed_password=""
-    )
-    await database.execute(insert_guest_user_query)
-
-    # 2. Re-assign all financial records to the new guest user
-    # Update transaction_splits
-    update_splits_query = transaction_splits.update().where(
-        transaction_splits.c.userId == original_user_id
-    ).values(userId=guest_user_id)
-    await database.execute(update_splits_query)
-
-    # Update payerId in transactions
-    update_payer_query = transactions.update().where(
-        transactions.c.payerId == original_user_id
-    ).values(payerId=guest_user_id)
-    await database.execute(update_payer_query)
-    
-    # Update createdById in transactions
-    update_createdby_query = transactions.update().where(
-        transactions.c.createdById == original_user_id
-    ).values(createdById=guest_user_id)
-    await database.execute(update_createdby_query)
-
-    # 3. Delete the original member from the group
-    delete_member_query = members.delete().where(
-        (members.c.groupId == groupId) & (members.c.userId == original_user_id)
-    )
-    await database.execute(delete_member_query)
-
-    # 4. Add the new guest as a member of the group, keeping original name for display
-    add_guest_member_query = members.insert().values(
-        userId=guest_user_id,
-        groupId=groupId,
-        username=original_username, # Keep original username for display
-        role=UserRole.GUEST,
-        isActive=True
-    )
-    await database.execute(add_guest_member_query)
-    
-    # --- End Replacement Process ---
+    version, guest_member = await replace_member_with_guest_user(groupId, target_member["userId"], target_member["username"])
 
-    # Fetch and return the updated group
-    updated_group_query = groups.select().where(groups.c.id == groupId)
-    updated_group = await database.fetch_one(updated_group_query)
-    group_members = await database.fetch_all(
-        members.select().where((members.c.groupId == groupId) & (members.c.isActive == True))
-    )
-    return {**updated_group, "members": group_members}
+    # Return the group with the guest in place of the removed member, reading it again if another write has landed since
+    if version != membership.version + 1:
+        access = await load_group_access(groupId)
+        return {**access.group, "members": access.active_members()}
+    group_members = [member for member in membership.active_members() if member["userId"] != memberId]
+    return {**membership.group, "members": [*group_members, guest_member]}
 
 
 @router.post("/{groupId}/leave", status_code=status.HTTP_200_OK)
-async def leave_group(groupId: str, current_user: User = Depends(get_current_user)):
-    # Check if group exists
-    group_query = groups.select().where(groups.c.id == groupId)
-    group = await database.fetch_one(group_query)
-    if not group:
-        raise HTTPException(status_code=404, detail="Group not found")
-
-    # Check if user is a member
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    member = await database.fetch_one(member_query)
-    if not member or not member["isActive"]:
+async def leave_group(groupId: str, membership: GroupMembership = Depends(get_group_membership)):
+    member = membership.member
+    if not member["isActive"]:
         raise HTTPException(status_code=403, detail="You are not an active member of this group.")
 
     # Prevent OWNER from leaving
     if member["role"] == UserRole.OWNER:
         raise HTTPException(status_code=400, detail="The group owner cannot leave the group. You can delete the group instead.")
 
-    # --- Start Replacement Process ---
-    original_user_id = current_user.id
-    original_username = current_user["username"]
-    group_id_short = groupId[:8]
-
-    # 1. Create a new virtual guest user
-    guest_user_id = str(uuid4())
-    guest_username_unique = f"{original_username}-{guest_user_id[:8]}" # Make username globally unique
-    guest_email = f"{original_username.replace(' ', '_').lower()}.{group_id_short}@guest.kanak"
-    insert_guest_user_query = users.insert().values(
-        id=guest_user_id,
-        username=guest_username_unique,
-        email=guest_email,
-        hashed_password=""
-    )
-    await database.execute(insert_guest_user_query)
-
-    # 2. Re-assign all financial records to the new guest user
-    # Update transaction_splits
-    update_splits_query = transaction_splits.update().where(
-        transaction_splits.c.userId == original_user_id
-    ).values(userId=guest_user_id)
-    await database.execute(update_splits_query)
-
-    # Update payerId in transactions
-    update_payer_query = transactions.update().where(
-        transactions.c.payerId == original_user_id
-    ).values(payerId=guest_user_id)
-    await database.execute(update_payer_query)
-    
-    # Update createdById in transactions
-    update_createdby_query = transactions.update().where(
-        transactions.c.createdById == original_user_id
-    ).values(createdById=guest_user_id)
-    await database.execute(update_createdby_query)
-
-    # 3. Delete the original member from the group
-    delete_member_query = members.delete().where(
-        (members.c.groupId == groupId) & (members.c.userId == original_user_id)
-    )
-    await database.execute(delete_member_query)
-
-    # 4. Add the new guest as a member of the group, keeping original name for display
-    add_guest_member_query = members.insert().values(
-        userId=guest_user_id,
-        groupId=groupId,
-        username=original_username, # Keep original username for display
-        role=UserRole.GUEST,
-        isActive=True
-    )
-    await database.execute(add_guest_member_query)
+    await replace_member_with_guest_user(groupId, member["userId"], member["username"])
     
     return {"message": "You have successfully left the group and your records have been anonymized."}
 
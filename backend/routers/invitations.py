@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from models import Invitation, InvitationRespond, User, InvitationStatus, members, invitations
 from typing import List
 from uuid import UUID
-from database import database
+from authorization import invalidate_group_access
+from database import database, run_in_transaction
+from ledger import bump_ledger_version
+from pubsub import group_events
 from security import get_current_user
 
 router = APIRouter()
@@ -39,29 +42,37 @@ async def respond_to_invitation(invitationId: str, response: InvitationRespond,
                 status=InvitationStatus.ACCEPTED,
                 inviteeId=current_user.id
             )
-            await database.execute(update_invitation_query)
+            await run_in_transaction(lambda: database.execute(update_invitation_query))
             return {"message": "Invitation accepted. User is already a member of this group."}
 
-        # Add user to group members
-        insert_member_query = members.insert().values(
-            userId=current_user.id,
-            groupId=invitation_record["groupId"],
-            username=current_user.username,
-            role=invitation_record["role"],
-            isActive=True
-        )
-        await database.execute(insert_member_query)
+        async def write():
+            # Add user to group members
+            version = await bump_ledger_version(invitation_record["groupId"])
+            insert_member_query = members.insert().values(
+                userId=current_user.id,
+                groupId=invitation_record["groupId"],
+                username=current_user.username,
+                role=invitation_record["role"],
+                isActive=True,
+                changeVersion=version
+            )
+            await database.execute(insert_member_query)
 
-        # Update invitation status
-        update_invitation_query = invitations.update().where(invitations.c.id == invitationId).values(
-            status=InvitationStatus.ACCEPTED,
-            inviteeId=current_user.id # Ensure inviteeId is set if not already
-        )
-        await database.execute(update_invitation_query)
+            # Update invitation status
+            update_invitation_query = invitations.update().where(invitations.c.id == invitationId).values(
+                status=InvitationStatus.ACCEPTED,
+                inviteeId=current_user.id # Ensure inviteeId is set if not already
+            )
+            await database.execute(update_invitation_query)
+            return version
+
+        version = await run_in_transaction(write)
+        invalidate_group_access(invitation_record["groupId"])
+        group_events.publish(invitation_record["groupId"], "member", "added", current_user.id, version)
         return {"message": "Invitation accepted and user added to group"}
     else:
         update_invitation_query = invitations.update().where(invitations.c.id == invitationId).values(
             status=InvitationStatus.REJECTED
         )
-        await database.execute(update_invitation_query)
+        await run_in_transaction(lambda: database.execute(update_invitation_query))
         return {"message": "Invitation rejected"}
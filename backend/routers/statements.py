@@ -0,0 +1,167 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from cachetools import LRUCache
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from authorization import GroupMembership, get_group_membership
+from database import database
+from ledger import transaction_balance_deltas
+from models import members
+from money import format_minor_units
+from routers.balances import calculate_settlements
+from routers.transactions import iter_ledger
+from statement_pdf import render_statement_pdf
+
+router = APIRouter()
+
+STATEMENT_RENDER_WORKERS = int(os.getenv("STATEMENT_RENDER_WORKERS", "2"))
+STATEMENT_CACHE_SIZE = int(os.getenv("STATEMENT_CACHE_SIZE", "32"))
+
+class StatementRenderer:
+    """Renders statement PDFs in a process pool and caches them per group ledger version.
+
+    Cache keys start with ``(groupId, ledgerVersion)``, so any write to the group
+    makes the next request render afresh; older versions of the group's
+    statements are dropped as soon as a newer one is stored, and a render that
+    finishes late never evicts one for a newer version. Concurrent requests
+    for the same statement share a single render.
+    """
+
+    def __init__(self, workers: int, cache_size: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache = LRUCache(maxsize=cache_size)
+        self._in_flight = {}
+
+    def _get_executor(self):
+        if self._executor is None:
+            # Spawned workers only import the renderer, never the app's event loop or threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def render(self, key, build_statement):
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(key, build_statement))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _render(self, key, build_statement):
+        statement = await build_statement()
+        pdf = await asyncio.get_running_loop().run_in_executor(self._get_executor(), render_statement_pdf, statement)
+
+        groupId, ledger_version = key[0], key[1]
+        for stale_key in [k for k in self._cache if k[0] == groupId and k[1] < ledger_version]:
+            self._cache.pop(stale_key, None)
+        self._cache[key] = pdf
+        return pdf
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+statement_renderer = StatementRenderer(STATEMENT_RENDER_WORKERS, STATEMENT_CACHE_SIZE)
+
+def format_impact(amount: int) -> str:
+    """Signed decimal string for an amount in minor units, or ``-`` for none."""
+    if amount == 0:
+        return "-"
+    return f"+{format_minor_units(amount)}" if amount > 0 else format_minor_units(amount)
+
+def start_of_day(day: date, tz: ZoneInfo) -> datetime:
+    """Midnight of ``day`` in ``tz``, as the naive UTC datetime transactions are stored in."""
+    return datetime.combine(day, datetime.min.time(), tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+def in_zone(value: datetime, tz: ZoneInfo) -> datetime:
+    """A stored date (naive dates are UTC) in ``tz``."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(tz)
+
+async def build_statement(groupId: str, group_name: str, from_date: Optional[date], to_date: Optional[date], tz: ZoneInfo):
+    """Collect everything the PDF shows as plain, picklable data.
+
+    Days and times are those of ``tz``, and the date range covers whole days in it.
+    """
+    group_members = await database.fetch_all(
+        members.select().where((members.c.groupId == groupId) & (members.c.isActive == True))
+    )
+    member_ids = [member["userId"] for member in group_members]
+    totals = dict.fromkeys(member_ids, 0)
+
+    rows = []
+    async for transaction in iter_ledger(
+        groupId,
+        start_of_day(from_date, tz) if from_date else None,
+        start_of_day(to_date + timedelta(days=1), tz) if to_date else None,
+    ):
+        deltas = transaction_balance_deltas(transaction, transaction["splits"])
+        for userId in member_ids:
+            totals[userId] += deltas.get(userId, 0)
+        local_date = in_zone(transaction["date"], tz)
+        rows.append([
+            local_date.strftime("%m/%d/%Y"),
+            local_date.strftime("%I:%M %p").lstrip("0"),
+            transaction["description"] or "",
+            *(format_impact(deltas.get(userId, 0)) for userId in member_ids),
+        ])
+
+    member_balances = [
+        {"userId": member["userId"], "username": member["username"], "balance": totals[member["userId"]]}
+        for member in group_members
+    ]
+    settlements = [
+        f"{settlement['fromUsername']} owes {settlement['toUsername']} {format_minor_units(settlement['amount'])}"
+        for settlement in calculate_settlements(member_balances)
+    ]
+
+    return {
+        "groupName": group_name,
+        "dateRange": f"{from_date.isoformat() if from_date else 'Start'} to {to_date.isoformat() if to_date else 'Today'}",
+        "generatedAt": datetime.now(tz).strftime("%m/%d/%Y %I:%M %p"),
+        "timeZone": tz.key,
+        "members": [member["username"] for member in group_members],
+        "rows": rows,
+        "totals": [
+            f"+{format_minor_units(mb['balance'])}" if mb["balance"] > 0 else format_minor_units(mb["balance"])
+            for mb in member_balances
+        ],
+        "settlements": settlements,
+    }
+
+@router.get("/{groupId}/statement", response_class=Response)
+async def get_group_statement(
+    groupId: str,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    tz: str = Query("UTC", description="IANA time zone the statement's dates and times are shown in"),
+    membership: GroupMembership = Depends(get_group_membership),
+):
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown time zone: {tz}")
+
+    group_name = membership.group["name"]
+    pdf = await statement_renderer.render(
+        (groupId, membership.version, from_date, to_date, zone.key),
+        lambda: build_statement(groupId, group_name, from_date, to_date, zone),
+    )
+    filename = f"{'_'.join(group_name.split())}_ledger.pdf"
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
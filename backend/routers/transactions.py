@@ -1,64 +1,173 @@
+import base64
+import binascii
+import codecs
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime, timezone
 from typing import List, Optional
 from uuid import uuid4
-from fastapi import APIRouter, Depends, HTTPException, status
-from database import database
-from models import User, UserRole, Transaction, TransactionCreate, TransactionSplitCreate, SplitMode, TransactionUpdate
-from models import transactions, members, transaction_splits
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import and_, or_, select
+from authorization import (
+    TRANSACTION_CREATOR_ROLES,
+    TRANSACTION_EDITOR_ROLES,
+    GroupMembership,
+    get_group_membership,
+    require_group_role,
+)
+from database import database, run_in_transaction
+from etags import conditional_response, group_etag
+from ledger import apply_balance_deltas, bump_ledger_version, merge_deltas, record_tombstones, transaction_balance_deltas
+from models import User, Transaction, TransactionCreate, TransactionSplitCreate, SplitMode, TransactionUpdate, TransactionType
+from models import TransactionImportRow, TransactionImportResult, ExportFormat
+from models import ChangeEntity, transactions, transaction_splits
+from money import (
+    FULL_PERCENTAGE,
+    allocate_by_weights,
+    allocate_equal,
+    format_minor_units,
+    from_minor_units,
+    from_scaled_percentage,
+    to_minor_units,
+    to_scaled_percentage,
+)
+from profiling import query_budget
+from pubsub import group_events
 from security import get_current_user
 
 router = APIRouter(tags=["transactions"])
 
-async def authorize_transaction_creation(groupId: str, current_user: User):
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    member = await database.fetch_one(member_query)
-    if not member:
-        raise HTTPException(status_code=403, detail="Not authorized for this group.")
-    
-    if member["role"] not in [UserRole.OWNER, UserRole.ADMIN, UserRole.EDITOR, UserRole.CONTRIBUTOR]:
-        raise HTTPException(status_code=403, detail="Your role does not permit creating transactions.")
-
-async def authorize_transaction_modification(groupId: str, current_user: User):
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    member = await database.fetch_one(member_query)
-    if not member:
-        raise HTTPException(status_code=403, detail="Not authorized for this group.")
-    
-    if member["role"] not in [UserRole.OWNER, UserRole.ADMIN, UserRole.EDITOR]:
-        raise HTTPException(status_code=403, detail="Your role does not permit modifying transactions.")
+require_transaction_creator = require_group_role(TRANSACTION_CREATOR_ROLES, "Your role does not permit creating transactions.")
+require_transaction_editor = require_group_role(TRANSACTION_EDITOR_ROLES, "Your role does not permit modifying transactions.")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Bulk imports commit this many transactions per DB transaction
+IMPORT_CHUNK_SIZE = 500
+# Split rows are inserted in slices of this size to stay under driver parameter limits
+SPLIT_INSERT_BATCH_SIZE = 1000
+
+# Exports are flushed to the client in pieces of roughly this many bytes
+EXPORT_FLUSH_BYTES = 64 * 1024
+EXPORT_CSV_COLUMNS = ["id", "date", "type", "amount", "description", "payerId", "createdBy", "createdById", "splitMode", "splits"]
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert an aware datetime to UTC; naive ones are taken to be UTC already.
+
+    SQLite keeps datetimes as text without their offset and compares them as
+    strings, so every stored or compared date must be in the same zone.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc)
+
+def encode_cursor(transaction_record) -> str:
+    raw = f"{transaction_record['date'].isoformat()}|{transaction_record['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        date_part, transaction_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return as_utc(datetime.fromisoformat(date_part)), transaction_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def serialize_split(split):
+    return {
+        "userId": split["userId"],
+        "amount": from_minor_units(split["amount"]),
+        "percentage": from_scaled_percentage(split["percentage"]),
+    }
+
+def serialize_transaction(transaction_record, splits):
+    """API form of a stored transaction and its splits: decimal amounts instead of minor units."""
+    return {
+        **transaction_record,
+        "amount": from_minor_units(transaction_record["amount"]),
+        "splits": [serialize_split(split) for split in splits],
+    }
+
+async def attach_splits(transaction_records, condition):
+    """Attach splits to transaction rows using a single query, in API form.
+
+    ``condition`` is a filter on ``transactions`` matching ``transaction_records``;
+    splits are fetched through a join on it and grouped in memory.
+    """
+    if not transaction_records:
+        return []
+
+    splits_query = transaction_splits.select().select_from(
+        transaction_splits.join(transactions, transaction_splits.c.transactionId == transactions.c.id)
+    ).where(condition)
+
+    splits_by_transaction = defaultdict(list)
+    for split in await database.fetch_all(splits_query):
+        splits_by_transaction[split["transactionId"]].append(split)
+
+    return [serialize_transaction(trans_rec, splits_by_transaction[trans_rec["id"]]) for trans_rec in transaction_records]
 
 @router.get("/{groupId}/transactions", response_model=List[Transaction])
-async def get_transactions_for_group(groupId: str, current_user: User = Depends(get_current_user)):
-    # Check if user is a member of the group
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    if not await database.fetch_one(member_query):
-        raise HTTPException(status_code=403, detail="Not authorized to view transactions for this group")
+async def get_transactions_for_group(
+    groupId: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    from_date: Optional[datetime] = Query(None, alias="from"),
+    to_date: Optional[datetime] = Query(None, alias="to"),
+    type: Optional[TransactionType] = None,
+    payerId: Optional[str] = None,
+    membership: GroupMembership = Depends(get_group_membership),
+):
+    # Answer conditional requests before loading anything else
+    etag = group_etag(groupId, membership.version, "transactions", request.url.query)
+    not_modified = conditional_response(request, response, etag)
+    if not_modified:
+        return not_modified
+
+    conditions = [transactions.c.groupId == groupId]
+    if from_date:
+        conditions.append(transactions.c.date >= as_utc(from_date))
+    if to_date:
+        conditions.append(transactions.c.date <= as_utc(to_date))
+    if type:
+        conditions.append(transactions.c.type == type)
+    if payerId:
+        conditions.append(transactions.c.payerId == payerId)
+    if cursor:
+        # Keyset pagination: resume strictly after the last (date, id) of the previous page
+        cursor_date, cursor_id = decode_cursor(cursor)
+        conditions.append(or_(
+            transactions.c.date > cursor_date,
+            and_(transactions.c.date == cursor_date, transactions.c.id > cursor_id),
+        ))
 
-    query = transactions.select().where(transactions.c.groupId == groupId)
+    # Fetch one extra row to know whether another page follows
+    query = transactions.select().where(and_(*conditions)).order_by(
+        transactions.c.date, transactions.c.id
+    ).limit(limit + 1)
     transaction_records = await database.fetch_all(query)
 
-    # Fetch splits for each transaction
-    transactions_with_splits = []
-    for trans_rec in transaction_records:
-        splits_query = transaction_splits.select().where(transaction_splits.c.transactionId == trans_rec["id"])
-        splits = await database.fetch_all(splits_query)
-        transactions_with_splits.append({**trans_rec, "splits": splits})
-    
-    return transactions_with_splits
+    if len(transaction_records) > limit:
+        transaction_records = transaction_records[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(transaction_records[-1])
+
+    # Fetch the splits of every transaction on the page at once
+    page_ids = [trans_rec["id"] for trans_rec in transaction_records]
+    return await attach_splits(transaction_records, transactions.c.id.in_(page_ids))
 
 @router.get("/{groupId}/transactions/{transactionId}", response_model=Transaction)
-async def get_transaction_by_id(groupId: str, transactionId: str, current_user: User = Depends(get_current_user)):
-    # Check if user is a member of the group
-    member_query = members.select().where(
-        (members.c.groupId == groupId) & (members.c.userId == current_user.id)
-    )
-    if not await database.fetch_one(member_query):
-        raise HTTPException(status_code=403, detail="Not authorized to view transactions for this group")
+async def get_transaction_by_id(groupId: str, transactionId: str, request: Request, response: Response, membership: GroupMembership = Depends(get_group_membership)):
+    # Answer conditional requests before loading anything else
+    not_modified = conditional_response(request, response, group_etag(groupId, membership.version, "transaction", transactionId))
+    if not_modified:
+        return not_modified
 
     transaction_query = transactions.select().where(
         (transactions.c.id == transactionId) & (transactions.c.groupId == groupId)
@@ -68,138 +177,438 @@ async def get_transaction_by_id(groupId: str, transactionId: str, current_user:
     if not transaction_record:
         raise HTTPException(status_code=404, detail="TransactionNotFound")
 
-    splits_query = transaction_splits.select().where(transaction_splits.c.transactionId == transactionId)
-    splits = await database.fetch_all(splits_query)
-    
-    return {**transaction_record, "splits": splits}
+    return (await attach_splits([transaction_record], transactions.c.id == transactionId))[0]
+
+def allocate_splits(transaction_data: TransactionCreate):
+    """Validate the splits and return the total and split rows in minor units.
 
-def validate_splits(transaction_data: TransactionCreate):
-    total_amount = transaction_data.amount
+    The server computes EQUAL and PERCENTAGE shares from the total, so they
+    always add up to it exactly. EQUAL needs only the participants, as
+    ``participantIds`` or as splits without amounts. PERCENTAGE needs each
+    split's percentage. Only AMOUNT splits carry their amounts, and these must
+    add up to the total to the minor unit.
+    """
+    total_amount = to_minor_units(transaction_data.amount)
     split_mode = transaction_data.splitMode
     splits = transaction_data.splits
 
+    if transaction_data.participantIds is not None:
+        if splits:
+            raise HTTPException(status_code=400, detail="Send either splits or participantIds, not both.")
+        if split_mode != SplitMode.EQUAL:
+            raise HTTPException(status_code=400, detail="participantIds can only be used with EQUAL splits.")
+        splits = [TransactionSplitCreate(userId=userId) for userId in transaction_data.participantIds]
+
     if not splits:
         raise HTTPException(status_code=400, detail="Transaction must have at least one split.")
+    split_user_ids = [split.userId for split in splits]
+    if len(set(split_user_ids)) != len(split_user_ids):
+        raise HTTPException(status_code=400, detail="A member can only appear once in the splits.")
 
-    if split_mode == SplitMode.PERCENTAGE:
-        total_percentage = sum(s.percentage for s in splits if s.percentage is not None)
-        if abs(total_percentage - 100.0) > 0.01:
+    percentages = [to_scaled_percentage(s.percentage) for s in splits]
+    if split_mode == SplitMode.EQUAL:
+        amounts = allocate_equal(total_amount, len(splits))
+    elif split_mode == SplitMode.PERCENTAGE:
+        if None in percentages or sum(percentages) != FULL_PERCENTAGE:
             raise HTTPException(status_code=400, detail="Sum of percentages must be 100%.")
-    elif split_mode == SplitMode.AMOUNT:
-        total_split_amount = sum(s.amount for s in splits)
-        if abs(total_split_amount - total_amount) > 0.01:
+        amounts = allocate_by_weights(total_amount, percentages)
+    else:
+        if any(s.amount is None for s in splits):
+            raise HTTPException(status_code=400, detail="Every AMOUNT split needs an amount.")
+        amounts = [to_minor_units(s.amount) for s in splits]
+        if sum(amounts) != total_amount:
             raise HTTPException(status_code=400, detail="Sum of split amounts must equal total amount.")
 
+    return total_amount, [
+        {"userId": userId, "amount": amount, "percentage": percentage}
+        for userId, amount, percentage in zip(split_user_ids, amounts, percentages)
+    ]
+
 @router.post("/{groupId}/transactions", response_model=Transaction, status_code=status.HTTP_201_CREATED)
-async def add_transaction(groupId: str, transaction_data: TransactionCreate, current_user: User = Depends(get_current_user)):
-    await authorize_transaction_creation(groupId, current_user)
-    validate_splits(transaction_data) # Validate splits
-    
-    # Insert transaction
+async def add_transaction(
+    groupId: str,
+    transaction_data: TransactionCreate,
+    membership: GroupMembership = Depends(require_transaction_creator),
+    current_user: User = Depends(get_current_user),
+):
+    total_amount, splits = allocate_splits(transaction_data)
+
     transaction_id = str(uuid4())
-    transaction_query = transactions.insert().values(
-        id=transaction_id,
-        groupId=groupId,
-        type=transaction_data.type,
-        amount=transaction_data.amount,
-        description=transaction_data.description,
-        createdBy=current_user.username,
-        createdById=current_user.id,
-        payerId=transaction_data.payerId,
-        splitMode=transaction_data.splitMode
-    )
-    await database.execute(transaction_query)
+    transaction_values = {
+        "id": transaction_id,
+        "groupId": groupId,
+        "type": transaction_data.type,
+        "amount": total_amount,
+        "description": transaction_data.description,
+        "createdBy": current_user.username,
+        "createdById": current_user.id,
+        "payerId": transaction_data.payerId,
+        "splitMode": transaction_data.splitMode,
+        # Set here rather than by the column's server default, which SQLite writes without
+        # the fractional seconds that bound datetimes carry, breaking cursor comparisons
+        "date": datetime.now(timezone.utc),
+    }
+    split_values = [{"transactionId": transaction_id, **split} for split in splits]
 
-    # Insert splits
-    split_values = []
-    for split in transaction_data.splits:
-        split_values.append({
-            "transactionId": transaction_id,
-            "userId": split.userId,
-            "amount": split.amount,
-            "percentage": split.percentage
-        })
-    if split_values:
-        await database.execute_many(transaction_splits.insert(), split_values)
+    async def write():
+        version = await bump_ledger_version(groupId)
+
+        # Insert transaction, reading back the server-side defaults such as the date
+        transaction_record = await database.fetch_one(
+            transactions.insert().values(**transaction_values, changeVersion=version).returning(*transactions.c)
+        )
 
-    # Fetch the newly created transaction with its splits
-    new_transaction_query = transactions.select().where(transactions.c.id == transaction_id)
-    new_transaction_record = await database.fetch_one(new_transaction_query)
-    
-    new_splits_query = transaction_splits.select().where(transaction_splits.c.transactionId == transaction_id)
-    new_splits = await database.fetch_all(new_splits_query)
+        # Insert splits
+        if split_values:
+            await database.execute(transaction_splits.insert().values(split_values))
 
-    return {**new_transaction_record, "splits": new_splits}
+        await apply_balance_deltas(groupId, transaction_balance_deltas(transaction_values, split_values))
+        return version, transaction_record
+
+    version, transaction_record = await run_in_transaction(write)
+    group_events.publish(groupId, "transaction", "created", transaction_id, version)
+
+    return serialize_transaction(transaction_record, split_values)
 
 @router.put("/{groupId}/transactions/{transactionId}", response_model=Transaction)
-async def update_transaction(groupId: str, transactionId: str, transaction_data: TransactionUpdate, current_user: User = Depends(get_current_user)):
-    await authorize_transaction_modification(groupId, current_user)
-    
-    # Check if transaction exists and belongs to the group
-    existing_transaction_query = transactions.select().where(
-        (transactions.c.id == transactionId) & (transactions.c.groupId == groupId)
-    )
-    if not await database.fetch_one(existing_transaction_query):
-        raise HTTPException(status_code=404, detail="TransactionNotFound")
+async def update_transaction(groupId: str, transactionId: str, transaction_data: TransactionUpdate, membership: GroupMembership = Depends(require_transaction_editor)):
+    total_amount, splits = allocate_splits(transaction_data)
 
-    validate_splits(transaction_data) # Validate splits
-    
     # Prepare update values
     update_values = {
         "type": transaction_data.type,
-        "amount": transaction_data.amount,
+        "amount": total_amount,
         "description": transaction_data.description,
         "payerId": transaction_data.payerId,
         "splitMode": transaction_data.splitMode,
     }
     if transaction_data.date:
-        update_values["date"] = transaction_data.date
+        update_values["date"] = as_utc(transaction_data.date)
 
-    # Update transaction
-    update_transaction_query = transactions.update().where(transactions.c.id == transactionId).values(**update_values)
-    await database.execute(update_transaction_query)
+    split_values = [{"transactionId": transactionId, **split} for split in splits]
 
-    # Delete existing splits and insert new ones
-    delete_splits_query = transaction_splits.delete().where(transaction_splits.c.transactionId == transactionId)
-    await database.execute(delete_splits_query)
+    async def write():
+        version = await bump_ledger_version(groupId)
 
-    split_values = []
-    for split in transaction_data.splits:
-        split_values.append({
-            "transactionId": transactionId,
-            "userId": split.userId,
-            "amount": split.amount,
-            "percentage": split.percentage
-        })
-    if split_values:
-        await database.execute_many(transaction_splits.insert(), split_values)
+        # Check if transaction exists and belongs to the group
+        existing_transaction = await database.fetch_one(transactions.select().where(
+            (transactions.c.id == transactionId) & (transactions.c.groupId == groupId)
+        ))
+        if not existing_transaction:
+            raise HTTPException(status_code=404, detail="TransactionNotFound")
+
+        # Update transaction
+        update_transaction_query = transactions.update().where(transactions.c.id == transactionId).values(
+            **update_values, changeVersion=version
+        )
+        await database.execute(update_transaction_query)
+
+        # Delete existing splits, keeping them to reverse their balance effect, and insert new ones
+        delete_splits_query = transaction_splits.delete().where(
+            transaction_splits.c.transactionId == transactionId
+        ).returning(*transaction_splits.c)
+        existing_splits = await database.fetch_all(delete_splits_query)
+        if split_values:
+            await database.execute(transaction_splits.insert().values(split_values))
 
-    # Fetch the updated transaction with its splits
-    updated_transaction_query = transactions.select().where(transactions.c.id == transactionId)
-    updated_transaction_record = await database.fetch_one(updated_transaction_query)
-    
-    updated_splits_query = transaction_splits.select().where(transaction_splits.c.transactionId == transactionId)
-    updated_splits = await database.fetch_all(updated_splits_query)
+        # Reverse the old version's effect on balances and apply the new one
+        await apply_balance_deltas(groupId, merge_deltas(
+            transaction_balance_deltas(existing_transaction, existing_splits, sign=-1),
+            transaction_balance_deltas({**update_values, "createdById": existing_transaction["createdById"]}, split_values),
+        ))
+        return version, existing_transaction
 
-    return {**updated_transaction_record, "splits": updated_splits}
+    version, existing_transaction = await run_in_transaction(write)
+    group_events.publish(groupId, "transaction", "updated", transactionId, version)
+
+    return serialize_transaction({**existing_transaction, **update_values, "changeVersion": version}, split_values)
 
 @router.delete("/{groupId}/transactions/{transactionId}", status_code=status.HTTP_200_OK)
-async def delete_transaction(groupId: str, transactionId: str, current_user: User = Depends(get_current_user)):
-    await authorize_transaction_modification(groupId, current_user)
+async def delete_transaction(groupId: str, transactionId: str, membership: GroupMembership = Depends(require_transaction_editor)):
+    async def write():
+        version = await bump_ledger_version(groupId)
 
-    # Check if transaction exists and belongs to the group
-    existing_transaction_query = transactions.select().where(
-        (transactions.c.id == transactionId) & (transactions.c.groupId == groupId)
-    )
-    if not await database.fetch_one(existing_transaction_query):
-        raise HTTPException(status_code=404, detail="TransactionNotFound")
-    
-    # Delete splits first
-    delete_splits_query = transaction_splits.delete().where(transaction_splits.c.transactionId == transactionId)
-    await database.execute(delete_splits_query)
+        # Delete splits first, then the transaction; the returned rows say what to take off the balances
+        delete_splits_query = transaction_splits.delete().where(
+            transaction_splits.c.transactionId.in_(
+                select(transactions.c.id).where((transactions.c.id == transactionId) & (transactions.c.groupId == groupId))
+            )
+        ).returning(*transaction_splits.c)
+        existing_splits = await database.fetch_all(delete_splits_query)
+
+        delete_transaction_query = transactions.delete().where(
+            (transactions.c.id == transactionId) & (transactions.c.groupId == groupId)
+        ).returning(*transactions.c)
+        existing_transaction = await database.fetch_one(delete_transaction_query)
+        if not existing_transaction:
+            raise HTTPException(status_code=404, detail="TransactionNotFound")
 
-    # Delete transaction
-    delete_transaction_query = transactions.delete().where(transactions.c.id == transactionId)
-    await database.execute(delete_transaction_query)
+        await apply_balance_deltas(
+            groupId, transaction_balance_deltas(existing_transaction, existing_splits, sign=-1)
+        )
+        await record_tombstones(groupId, ChangeEntity.TRANSACTION, [transactionId], version)
+        return version
+
+    version = await run_in_transaction(write)
+    group_events.publish(groupId, "transaction", "deleted", transactionId, version)
 
     return {"message": "Transaction deleted successfully"}
+
+async def iter_request_lines(request: Request):
+    """Yield the lines of the body as they arrive, each with its line ending."""
+    # Incremental, so a character split across two chunks is decoded whole
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    async for chunk in request.stream():
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+async def iter_csv_records(request: Request):
+    """Yield the text of each CSV record; a quoted field may hold line breaks, as the export writes them."""
+    record, quotes = "", 0
+    async for line in iter_request_lines(request):
+        record += line
+        # Quotes inside a quoted field are doubled, so the record is complete once they pair up
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            yield record
+            record, quotes = "", 0
+    if record:
+        yield record
+
+def parse_csv_record(record: str):
+    return next(csv.reader(io.StringIO(record, newline=""), strict=True))
+
+def parse_csv_splits(value: str):
+    """Parse ``userId[:amount[:percentage]]`` entries separated by ``;``; the amount may be left empty."""
+    splits = []
+    for entry in filter(None, (part.strip() for part in value.split(";"))):
+        fields = entry.split(":")
+        if len(fields) > 3:
+            raise ValueError(f"Invalid split '{entry}', expected userId[:amount[:percentage]].")
+        splits.append({
+            "userId": fields[0],
+            "amount": fields[1] if len(fields) > 1 and fields[1] else None,
+            "percentage": fields[2] if len(fields) == 3 and fields[2] else None,
+        })
+    return splits
+
+async def iter_import_rows(request: Request, is_csv: bool):
+    """Yield ``(row number, raw row dict or parse error)`` for each non-empty CSV record or NDJSON line."""
+    header = None
+    row_number = 0
+    async for record in iter_csv_records(request) if is_csv else iter_request_lines(request):
+        if not record.strip():
+            continue
+        if is_csv and header is None:
+            try:
+                header = [column.strip() for column in parse_csv_record(record)]
+            except csv.Error as e:
+                raise HTTPException(status_code=400, detail=f"Invalid CSV header: {e}")
+            continue
+        row_number += 1
+        try:
+            if is_csv:
+                row = dict(zip(header, parse_csv_record(record)))
+                row["splits"] = parse_csv_splits(row.get("splits", ""))
+                if not row.get("date"):
+                    row.pop("date", None)
+            else:
+                row = json.loads(record)
+            yield row_number, row
+        except (ValueError, csv.Error) as e:
+            yield row_number, e
+
+def validate_import_row(raw_row, member_ids):
+    """Return the parsed row, its total and its split rows in minor units."""
+    row = TransactionImportRow.model_validate(raw_row)
+    total_amount, splits = allocate_splits(row)
+    unknown_ids = {row.payerId, *(split["userId"] for split in splits)} - member_ids
+    if unknown_ids:
+        raise HTTPException(status_code=400, detail=f"Not members of this group: {', '.join(sorted(unknown_ids))}.")
+    return row, total_amount, splits
+
+async def insert_transaction_chunk(groupId: str, rows, current_user: User):
+    transaction_values = []
+    split_values = []
+    deltas = []
+    now = datetime.now(timezone.utc)
+    for row, total_amount, row_splits in rows:
+        transaction_id = str(uuid4())
+        values = {
+            "id": transaction_id,
+            "groupId": groupId,
+            "type": row.type,
+            "amount": total_amount,
+            "description": row.description,
+            "date": as_utc(row.date) or now,
+            "createdBy": current_user.username,
+            "createdById": current_user.id,
+            "payerId": row.payerId,
+            "splitMode": row.splitMode,
+        }
+        splits = [{"transactionId": transaction_id, **split} for split in row_splits]
+        transaction_values.append(values)
+        split_values.extend(splits)
+        deltas.append(transaction_balance_deltas(values, splits))
+
+    async def write():
+        version = await bump_ledger_version(groupId)
+        await database.execute(transactions.insert().values([{**values, "changeVersion": version} for values in transaction_values]))
+        for start in range(0, len(split_values), SPLIT_INSERT_BATCH_SIZE):
+            await database.execute(transaction_splits.insert().values(split_values[start:start + SPLIT_INSERT_BATCH_SIZE]))
+        await apply_balance_deltas(groupId, merge_deltas(*deltas))
+        return version
+
+    version = await run_in_transaction(write)
+    group_events.publish(groupId, "transaction", "imported", None, version)
+
+# Queries grow with the size of the upload, a few per chunk
+@router.post("/{groupId}/transactions/import", response_model=TransactionImportResult, dependencies=[Depends(query_budget(0))])
+async def import_transactions(
+    groupId: str,
+    request: Request,
+    membership: GroupMembership = Depends(require_transaction_creator),
+    current_user: User = Depends(get_current_user),
+):
+    """Bulk-create transactions from a streamed CSV or NDJSON body.
+
+    NDJSON lines carry the same fields as a single transaction (plus an optional
+    ``date``). CSV needs a header row with ``type,amount,description,payerId,splitMode``,
+    an optional ``date`` and a ``splits`` column of ``userId[:amount[:percentage]]``
+    entries separated by ``;``; only AMOUNT splits need the amount. Valid rows are written in chunks, each in its own
+    DB transaction; invalid rows are skipped and reported by row number.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        is_csv = True
+    elif "json" in content_type:
+        is_csv = False
+    else:
+        raise HTTPException(status_code=415, detail="Send the import as text/csv or application/x-ndjson.")
+
+    member_ids = {member["userId"] for member in membership.active_members()}
+
+    imported = 0
+    errors = []
+    chunk = []
+    async for row_number, raw_row in iter_import_rows(request, is_csv):
+        if isinstance(raw_row, Exception):
+            errors.append({"row": row_number, "detail": str(raw_row)})
+            continue
+        try:
+            chunk.append(validate_import_row(raw_row, member_ids))
+        except ValidationError as e:
+            errors.append({"row": row_number, "detail": "; ".join(
+                f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors()
+            )})
+            continue
+        except HTTPException as e:
+            errors.append({"row": row_number, "detail": e.detail})
+            continue
+        except (ValueError, ArithmeticError) as e:
+            # Whatever else a single row trips over is reported against it, not the whole import
+            errors.append({"row": row_number, "detail": str(e) or type(e).__name__})
+            continue
+
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await insert_transaction_chunk(groupId, chunk, current_user)
+            imported += len(chunk)
+            chunk = []
+
+    if chunk:
+        await insert_transaction_chunk(groupId, chunk, current_user)
+        imported += len(chunk)
+
+    return {"imported": imported, "failed": len(errors), "errors": errors}
+
+async def iter_ledger(groupId: str, from_date: Optional[datetime] = None, to_date: Optional[datetime] = None):
+    """Yield each transaction of a group with its splits, reading rows off a DB cursor.
+
+    Rows arrive ordered by transaction, so only the transaction being assembled
+    is held in memory. ``to_date`` is exclusive. Amounts stay in minor units.
+    """
+    conditions = [transactions.c.groupId == groupId]
+    if from_date:
+        conditions.append(transactions.c.date >= as_utc(from_date))
+    if to_date:
+        conditions.append(transactions.c.date < as_utc(to_date))
+
+    query = select(
+        transactions,
+        transaction_splits.c.userId.label("splitUserId"),
+        transaction_splits.c.amount.label("splitAmount"),
+        transaction_splits.c.percentage.label("splitPercentage"),
+    ).select_from(
+        transactions.outerjoin(transaction_splits, transaction_splits.c.transactionId == transactions.c.id)
+    ).where(and_(*conditions)).order_by(transactions.c.date, transactions.c.id)
+
+    current = None
+    async for row in database.iterate(query):
+        if current is None or current["id"] != row["id"]:
+            if current is not None:
+                yield current
+            current = {column.name: row[column.name] for column in transactions.columns}
+            current["splits"] = []
+        if row["splitUserId"] is not None:
+            current["splits"].append({"userId": row["splitUserId"], "amount": row["splitAmount"], "percentage": row["splitPercentage"]})
+    if current is not None:
+        yield current
+
+def format_csv_transaction(transaction):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([
+        transaction["id"],
+        transaction["date"].isoformat() if transaction["date"] else "",
+        transaction["type"].value if transaction["type"] else "",
+        format_minor_units(transaction["amount"]),
+        transaction["description"],
+        transaction["payerId"],
+        transaction["createdBy"],
+        transaction["createdById"],
+        transaction["splitMode"].value if transaction["splitMode"] else "",
+        ";".join(
+            f"{split['userId']}:{format_minor_units(split['amount'])}"
+            + (f":{from_scaled_percentage(split['percentage'])}" if split["percentage"] is not None else "")
+            for split in transaction["splits"]
+        ),
+    ])
+    return buffer.getvalue()
+
+def format_ndjson_transaction(transaction):
+    api_transaction = serialize_transaction(transaction, transaction["splits"])
+    return json.dumps(Transaction.model_validate(api_transaction).model_dump(mode="json")) + "\n"
+
+async def stream_ledger(groupId: str, export_format: ExportFormat):
+    if export_format == ExportFormat.CSV:
+        formatter = format_csv_transaction
+        pending = [",".join(EXPORT_CSV_COLUMNS) + "\r\n"]
+    else:
+        formatter = format_ndjson_transaction
+        pending = []
+    pending_bytes = 0
+    async for transaction in iter_ledger(groupId):
+        line = formatter(transaction)
+        pending.append(line)
+        pending_bytes += len(line)
+        if pending_bytes >= EXPORT_FLUSH_BYTES:
+            yield "".join(pending)
+            pending, pending_bytes = [], 0
+    if pending:
+        yield "".join(pending)
+
+@router.get("/{groupId}/export")
+async def export_transactions(groupId: str, format: ExportFormat = ExportFormat.CSV, membership: GroupMembership = Depends(get_group_membership)):
+    """Stream the group's ledger as CSV (in the import format) or NDJSON."""
+    media_type = "text/csv" if format == ExportFormat.CSV else "application/x-ndjson"
+    extension = "csv" if format == ExportFormat.CSV else "ndjson"
+    return StreamingResponse(
+        stream_ledger(groupId, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions-{groupId}.{extension}"'},
+    )
@@ -1,14 +1,21 @@
+import asyncio
+import hashlib
 import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import jwk, jwt, JWTError
+from jose.exceptions import JWKError
 from datetime import datetime, timedelta
 from typing import Optional
 import httpx 
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
 from models import users, User
 from database import database
-from cachetools import cached, TTLCache
+from cachetools import TLRUCache
+from backplane import SharedCache
 
 SECRET_KEY = os.getenv("SECRET_KEY", "a_super_secret_key")
 ALGORITHM = "HS256"
@@ -18,26 +25,193 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt runs on its own small thread pool so it never blocks the event loop.
+# Once PASSWORD_HASH_MAX_QUEUE calls are waiting for a worker, new ones get a 503.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+class PasswordHashPool:
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _get_executor(self):
+        # Created on first use, so the pool works again after a shutdown
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in requests, please retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+
+        def timed_call():
+            started = time.perf_counter()
+            return started, func(*args)
+
+        self.in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            started, result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), timed_call)
+        finally:
+            self.in_flight -= 1
+        finished = time.perf_counter()
+
+        wait_seconds = started - submitted
+        self.completed += 1
+        self.total_wait_seconds += wait_seconds
+        self.total_run_seconds += finished - started
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        return result
+
+    def metrics(self):
+        completed = self.completed or 1
+        return {
+            "workers": self.workers,
+            "maxQueue": self.max_queue,
+            "inFlight": self.in_flight,
+            "queued": max(self.in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avgWaitMs": round(self.total_wait_seconds / completed * 1000, 2),
+            "maxWaitMs": round(self.max_wait_seconds * 1000, 2),
+            "avgRunMs": round(self.total_run_seconds / completed * 1000, 2),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_hash_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
 # Supabase specific configurations
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_AUDIENCE = os.getenv("SUPABASE_AUDIENCE")
 SUPABASE_ISSUER = os.getenv("SUPABASE_ISSUER")
 
-# Cache JWKS for 1 hour
-@cached(cache=TTLCache(maxsize=1, ttl=3600))
-def get_jwks():
-    if not SUPABASE_URL:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="SUPABASE_URL environment variable not configured."
-        )
-    jwks_url = f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json"
-    try:
-        response = httpx.get(jwks_url)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not fetch JWKS: {e}")
+# Verified tokens are cached by hash until they expire (or AUTH_CACHE_TTL_SECONDS, whichever is sooner),
+# and user rows by Supabase user ID, so most requests skip the signature check and the users lookup.
+# Token verification is pure, so only the user cache needs invalidating across workers.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+
+def _claims_expiry(key, claims, now):
+    return min(now + AUTH_CACHE_TTL_SECONDS, claims.get("exp", now))
+
+verified_claims_cache = TLRUCache(maxsize=AUTH_CACHE_SIZE, ttu=_claims_expiry, timer=time.time)
+user_cache = SharedCache("users", maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+def _token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def invalidate_cached_user(supabase_user_id: str):
+    user_cache.invalidate(supabase_user_id)
+
+JWKS_TTL_SECONDS = int(os.getenv("JWKS_TTL_SECONDS", "3600"))
+# Background refreshes run this long before the keys go stale
+JWKS_REFRESH_MARGIN_SECONDS = int(os.getenv("JWKS_REFRESH_MARGIN_SECONDS", "300"))
+# Tokens with an unknown kid trigger a refetch at most this often
+JWKS_MIN_REFETCH_INTERVAL_SECONDS = int(os.getenv("JWKS_MIN_REFETCH_INTERVAL_SECONDS", "30"))
+
+class JWKSKeyStore:
+    """Signing keys from a JWKS endpoint, indexed by ``kid``.
+
+    Keys are fetched with an async client and each one is constructed once.
+    After ``start()`` a background task refreshes them before ``ttl`` runs out;
+    a token naming an unknown kid triggers at most one refetch per
+    ``min_refetch_interval``, and concurrent fetches share a single request.
+    """
+
+    def __init__(self, jwks_url: Optional[str], ttl: int = JWKS_TTL_SECONDS,
+                 refresh_margin: int = JWKS_REFRESH_MARGIN_SECONDS,
+                 min_refetch_interval: int = JWKS_MIN_REFETCH_INTERVAL_SECONDS):
+        self.jwks_url = jwks_url
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_refetch_interval = min_refetch_interval
+        self.keys_by_kid = {}
+        self.fetched_at: Optional[float] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._fetch_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            print(f"WARNING: Could not preload JWKS: {e}")
+        self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def refresh(self):
+        # Join the fetch in flight, if any, instead of starting another
+        if self._fetch_task is None or self._fetch_task.done():
+            self._fetch_task = asyncio.create_task(self._fetch())
+        await asyncio.shield(self._fetch_task)
+
+    async def get_key(self, kid: str):
+        if self.fetched_at is None or time.monotonic() - self.fetched_at >= self.ttl:
+            await self.refresh()
+        key = self.keys_by_kid.get(kid)
+        if key is None and time.monotonic() - self.fetched_at >= self.min_refetch_interval:
+            # The signing keys may have been rotated since the last fetch
+            await self.refresh()
+            key = self.keys_by_kid.get(kid)
+        return key
+
+    async def _fetch(self):
+        if not self.jwks_url:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="SUPABASE_URL environment variable not configured."
+            )
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10)
+        try:
+            response = await self._client.get(self.jwks_url)
+            response.raise_for_status()
+            jwks = response.json()
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not fetch JWKS: {e}")
+
+        keys_by_kid = {}
+        for key in jwks.get("keys", []):
+            try:
+                keys_by_kid[key["kid"]] = jwk.construct(key, key.get("alg", "RS256"))
+            except (KeyError, JWKError) as e:
+                print(f"Skipping unusable JWKS key {key.get('kid')}: {e}")
+        self.keys_by_kid = keys_by_kid
+        self.fetched_at = time.monotonic()
+
+    async def _refresh_periodically(self):
+        while True:
+            await asyncio.sleep(max(self.ttl - self.refresh_margin, 1))
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"WARNING: Background JWKS refresh failed: {e}")
+
+jwks_store = JWKSKeyStore(f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None)
 
 async def get_supabase_user_claims(token: Optional[str] = Depends(oauth2_scheme)):
     if token is None:
@@ -47,31 +221,24 @@ async def get_supabase_user_claims(token: Optional[str] = Depends(oauth2_scheme)
             headers={"WWW-Authenticate": "Bearer"},
         )
         
+    token_key = _token_cache_key(token)
+    cached_claims = verified_claims_cache.get(token_key)
+    if cached_claims is not None:
+        return cached_claims
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        jwks = get_jwks()
         unverified_header = jwt.get_unverified_header(token)
         kid = unverified_header.get("kid")
         if not kid:
             raise JWTError("Missing 'kid' in token header")
 
-        rsa_key = {}
-        for key in jwks["keys"]:
-            if key["kid"] == kid:
-                rsa_key = {
-                    "kty": key["kty"],
-                    "kid": key["kid"],
-                    "use": key["use"],
-                    "n": key["n"],
-                    "e": key["e"],
-                }
-                break
-        
-        if not rsa_key:
+        rsa_key = await jwks_store.get_key(kid)
+        if rsa_key is None:
             raise JWTError("Unable to find appropriate key in JWKS")
             
         payload = jwt.decode(
@@ -81,6 +248,7 @@ async def get_supabase_user_claims(token: Optional[str] = Depends(oauth2_scheme)
             audience=SUPABASE_AUDIENCE,
             issuer=SUPABASE_ISSUER,
         )
+        verified_claims_cache[token_key] = payload
         return payload
     except JWTError as e:
         print(f"JWT Validation Error: {e}")
@@ -89,11 +257,11 @@ async def get_supabase_user_claims(token: Optional[str] = Depends(oauth2_scheme)
         print(f"Unexpected error in get_supabase_user_claims: {e}")
         raise credentials_exception
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_hash_pool.run(pwd_context.verify, plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password[:72])
+async def get_password_hash(password):
+    return await password_hash_pool.run(pwd_context.hash, password[:72])
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -116,9 +284,29 @@ async def get_current_user(supabase_claims: dict = Depends(get_supabase_user_cla
     if not supabase_user_id:
         raise credentials_exception
 
+    cached_user = user_cache.get(supabase_user_id)
+    if cached_user is not None:
+        return cached_user
+
     query = users.select().where(users.c.supabase_user_id == supabase_user_id)
     user = await database.fetch_one(query)
 
     if user is None:
         raise credentials_exception
-    return User(**user)
+    current_user = User(**user)
+    user_cache[supabase_user_id] = current_user
+    return current_user
+
+# The /metrics endpoints answer only requests bearing this token, and 404 while it is unset
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+metrics_scheme = HTTPBearer(auto_error=False)
+
+async def require_metrics_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(metrics_scheme)):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not secrets.compare_digest(credentials.credentials.encode(), METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
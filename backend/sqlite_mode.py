@@ -0,0 +1,183 @@
+"""SQLite tuned for serving: WAL, one writer and a pool of readers.
+
+Turn it on with ``SQLITE_PRODUCTION_MODE=1`` when ``DATABASE_URL`` is SQLite.
+In WAL mode readers and the writer don't block each other, so reads run on a
+small pool of read-only connections that stay open. Writes all go through one
+connection: ``database.run_in_transaction`` hands them to ``SQLiteWriter``,
+which runs whatever is queued in one transaction, each write in its own
+savepoint, and commits the lot at once. A write that fails rolls back alone.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Optional
+import aiosqlite
+
+SQLITE_PRODUCTION_MODE = os.getenv("SQLITE_PRODUCTION_MODE", "0").lower() in ("1", "true", "yes")
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+# Most writes committed together; a batch only takes what is already queued
+SQLITE_WRITE_BATCH_SIZE = int(os.getenv("SQLITE_WRITE_BATCH_SIZE", "64"))
+SQLITE_MMAP_SIZE_BYTES = int(os.getenv("SQLITE_MMAP_SIZE_BYTES", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", str(64 * 1024)))
+# How long a connection waits on a lock held by another process, e.g. another uvicorn worker
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+def connection_pragmas():
+    return [
+        # NORMAL only syncs at checkpoints; in WAL mode a crash can lose recent commits but never corrupts
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+
+class SQLiteConnectionPool:
+    """Stands in for the pool of the ``databases`` SQLite backend, which opens a connection per query.
+
+    The writer task gets the one read-write connection; every other task gets a
+    read-only one, so a write that bypasses the queue fails instead of racing it.
+    """
+
+    def __init__(self, path: str, read_pool_size: int):
+        self.path = Path(path).absolute()
+        self.read_pool_size = read_pool_size
+        self.writer_task: Optional[asyncio.Task] = None
+        self._writer_connection: Optional[aiosqlite.Connection] = None
+        self._readers = []
+        self._idle: Optional[asyncio.Queue] = None
+        # Read by the databases SQLite backend when it disconnects
+        self._memref = None
+
+    async def _connect(self, read_only: bool) -> aiosqlite.Connection:
+        if read_only:
+            connection = await aiosqlite.connect(f"{self.path.as_uri()}?mode=ro", isolation_level=None, uri=True)
+        else:
+            connection = await aiosqlite.connect(str(self.path), isolation_level=None)
+            # Persistent: stored in the database file
+            await connection.execute("PRAGMA journal_mode=WAL")
+        for pragma in connection_pragmas():
+            await connection.execute(pragma)
+        return connection
+
+    async def open(self):
+        # The writer goes first so the database is in WAL mode before anyone reads
+        self._writer_connection = await self._connect(read_only=False)
+        self._idle = asyncio.Queue()
+        for _ in range(self.read_pool_size):
+            reader = await self._connect(read_only=True)
+            self._readers.append(reader)
+            self._idle.put_nowait(reader)
+
+    async def close(self):
+        for connection in [*self._readers, self._writer_connection]:
+            if connection is not None:
+                await connection.close()
+        self._readers = []
+        self._writer_connection = None
+
+    async def acquire(self, timeout: Optional[float] = None) -> aiosqlite.Connection:
+        if self.writer_task is not None and asyncio.current_task() is self.writer_task:
+            return self._writer_connection
+        return await asyncio.wait_for(self._idle.get(), timeout)
+
+    async def release(self, connection: aiosqlite.Connection):
+        if connection is not self._writer_connection:
+            self._idle.put_nowait(connection)
+
+    def get_size(self) -> int:
+        return len(self._readers) + 1
+
+    def get_idle_size(self) -> int:
+        return self._idle.qsize() if self._idle is not None else 0
+
+class SQLiteWriter:
+    """Runs every write on the pool's writer connection, committing queued writes together."""
+
+    def __init__(self, database, pool: SQLiteConnectionPool, batch_size: int):
+        self.database = database
+        self.pool = pool
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def in_writer(self) -> bool:
+        return asyncio.current_task() is self._task
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        self.pool.writer_task = self._task
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self.pool.writer_task = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("The database writer has stopped."))
+
+    async def submit(self, operation):
+        """Queue ``await operation()`` and wait until it has been committed."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            # Callers that gave up before their turn are skipped
+            batch = [(operation, future) for operation, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            outcomes = []
+            try:
+                async with self.database.transaction():
+                    for operation, _ in batch:
+                        try:
+                            async with self.database.transaction():
+                                outcomes.append((await operation(), None))
+                        except Exception as e:
+                            outcomes.append((None, e))
+            except Exception as e:
+                # Nothing in the batch was committed; callers may retry
+                self.failed_batches += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.writes += len(batch)
+            for (_, future), (result, error) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def metrics(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "writes": self.writes,
+            "batches": self.batches,
+            "failedBatches": self.failed_batches,
+            "avgBatchSize": round(self.writes / (self.batches or 1), 2),
+        }
@@ -0,0 +1,117 @@
+"""PDF rendering of group statements.
+
+Rendering is CPU-bound, so it runs in worker processes. This module only
+depends on fpdf2 and takes plain data, which keeps it cheap to import and
+pickle into a worker.
+"""
+from fpdf import FPDF
+from fpdf.fonts import FontFace
+
+PRIMARY_COLOR = (79, 70, 229)     # Indigo-600
+TEXT_COLOR = (31, 41, 55)         # Gray-800
+SUBTEXT_COLOR = (107, 114, 128)   # Gray-500
+POSITIVE_COLOR = (22, 163, 74)    # Green-600
+NEGATIVE_COLOR = (220, 38, 38)    # Red-600
+NEUTRAL_COLOR = (156, 163, 175)   # Gray-400
+ROW_FILL_COLOR = (249, 250, 251)  # Gray-50
+TOTAL_FILL_COLOR = (243, 244, 246)  # Gray-100
+
+
+class StatementPDF(FPDF):
+    def footer(self):
+        self.set_y(-10)
+        self.set_font("helvetica", size=8)
+        self.set_text_color(*SUBTEXT_COLOR)
+        self.cell(0, 5, f"Page {self.page_no()} of {{nb}}", align="R")
+
+
+def _latin1(text) -> str:
+    # The built-in PDF fonts only cover Latin-1
+    return str(text).encode("latin-1", "replace").decode("latin-1")
+
+
+def _amount_color(text: str):
+    if text.startswith("+"):
+        return POSITIVE_COLOR
+    if text.startswith("-") and text != "-":
+        return NEGATIVE_COLOR
+    return NEUTRAL_COLOR
+
+
+def render_statement_pdf(statement: dict) -> bytes:
+    """Render a statement built by ``routers.statements.build_statement`` to PDF bytes."""
+    pdf = StatementPDF(orientation="L", unit="mm", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    # Header
+    pdf.set_font("helvetica", "B", 24)
+    pdf.set_text_color(*PRIMARY_COLOR)
+    pdf.text(14, 18, "Kanak")
+    pdf.set_font("helvetica", size=10)
+    pdf.set_text_color(*SUBTEXT_COLOR)
+    pdf.text(14, 24, "TRANSACTION REPORT")
+    pdf.set_draw_color(229, 231, 235)
+    pdf.set_line_width(0.5)
+    pdf.line(14, 28, 283, 28)
+
+    pdf.set_font("helvetica", "B", 16)
+    pdf.set_text_color(*TEXT_COLOR)
+    pdf.text(14, 38, _latin1(statement["groupName"]))
+    pdf.set_font("helvetica", size=10)
+    pdf.set_text_color(*SUBTEXT_COLOR)
+    pdf.text(14, 44, _latin1(f"Date Range: {statement['dateRange']}"))
+    pdf.text(14, 49, _latin1(f"Generated on: {statement['generatedAt']} ({statement['timeZone']})"))
+
+    # Settlements
+    pdf.set_xy(14, 55)
+    if statement["settlements"]:
+        pdf.set_font("helvetica", "B", 14)
+        pdf.set_text_color(*TEXT_COLOR)
+        pdf.cell(0, 7, "Settlements", new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("helvetica", size=10)
+        pdf.set_text_color(*SUBTEXT_COLOR)
+        for settlement in statement["settlements"]:
+            pdf.set_x(14)
+            pdf.cell(0, 5, _latin1(settlement), new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(5)
+    else:
+        pdf.set_font("helvetica", size=10)
+        pdf.set_text_color(*SUBTEXT_COLOR)
+        pdf.cell(0, 5, "No settlements needed for this period.", new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(5)
+
+    # Ledger table: one signed column per member, totals in the last row
+    members = statement["members"]
+    member_width = max(18, min(30, (269 - 25 - 20 - 60) / max(len(members), 1)))
+    col_widths = (25, 20, max(60, 269 - 45 - member_width * len(members)), *([member_width] * len(members)))
+
+    pdf.set_font("helvetica", size=9)
+    pdf.set_text_color(*TEXT_COLOR)
+    pdf.set_draw_color(229, 231, 235)
+    pdf.set_line_width(0.1)
+    heading_style = FontFace(emphasis="BOLD", color=(255, 255, 255), fill_color=PRIMARY_COLOR)
+    with pdf.table(
+        col_widths=col_widths,
+        width=sum(col_widths),
+        align="LEFT",
+        headings_style=heading_style,
+        text_align=("CENTER", "CENTER", "LEFT", *(["RIGHT"] * len(members))),
+        borders_layout="HORIZONTAL_LINES",
+        cell_fill_color=ROW_FILL_COLOR,
+        cell_fill_mode="ROWS",
+        line_height=6,
+    ) as table:
+        table.row(["Date", f"Time ({_latin1(statement['timeZone'])})", "Description", *(_latin1(name) for name in members)])
+        for row in statement["rows"]:
+            cells = table.row()
+            for index, value in enumerate(row):
+                style = FontFace(color=_amount_color(value)) if index >= 3 else None
+                cells.cell(_latin1(value), style=style)
+        totals = table.row()
+        total_style = FontFace(emphasis="BOLD", fill_color=TOTAL_FILL_COLOR)
+        for index, value in enumerate(["TOTAL", "", "", *statement["totals"]]):
+            style = FontFace(emphasis="BOLD", color=_amount_color(value), fill_color=TOTAL_FILL_COLOR) if index >= 3 else total_style
+            totals.cell(value, style=style)
+
+    return bytes(pdf.output())
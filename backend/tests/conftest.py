@@ -0,0 +1,74 @@
+"""Shared fixtures: the app against a throwaway SQLite database, with sign-in stubbed out.
+
+Run from ``backend/`` with ``python -m pytest tests``.
+"""
+import os
+import sys
+import tempfile
+from uuid import uuid4
+
+# Configure before the app modules read their settings at import
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='kanak-tests-'), 'kanak.db')}"
+os.environ.setdefault("QUERY_BUDGET_STRICT", "1")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import sqlalchemy as sa
+from fastapi.testclient import TestClient
+
+import main
+import security
+from database import engine
+from models import User
+
+signed_in = {"user": None}
+main.app.dependency_overrides[security.get_current_user] = lambda: signed_in["user"]
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as test_client:
+        yield test_client
+    signed_in["user"] = None
+
+@pytest.fixture
+def make_user():
+    def make(name: str = "user") -> User:
+        user_id = str(uuid4())
+        username = f"{name}-{user_id[:8]}"
+        email = f"{username}@example.com"
+        with engine.begin() as connection:
+            connection.execute(
+                sa.text("INSERT INTO users (id, username, email, supabase_user_id) VALUES (:id, :username, :email, :sub)"),
+                {"id": user_id, "username": username, "email": email, "sub": f"sub-{user_id}"},
+            )
+        return User(id=user_id, username=username, email=email, supabase_user_id=f"sub-{user_id}")
+    return make
+
+@pytest.fixture
+def sign_in():
+    def sign_in(user: User):
+        signed_in["user"] = user
+    return sign_in
+
+@pytest.fixture
+def create_group(client, sign_in):
+    def create(owner: User, name: str = "Group") -> str:
+        sign_in(owner)
+        response = client.post("/groups/", json={"name": name})
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+    return create
+
+@pytest.fixture
+def add_member(client, sign_in):
+    """Invite ``user`` as ``owner`` and accept as ``user``; leaves ``owner`` signed in."""
+    def add(groupId: str, owner: User, user: User, role: str = "EDITOR"):
+        sign_in(owner)
+        response = client.post(f"/groups/{groupId}/members", json={"identifier": user.email, "role": role})
+        assert response.status_code == 200, response.text
+        sign_in(user)
+        invitation = next(i for i in client.get("/invitations/").json() if i["groupId"] == groupId)
+        response = client.post(f"/invitations/{invitation['id']}/respond", json={"accept": True})
+        assert response.status_code == 200, response.text
+        sign_in(owner)
+    return add
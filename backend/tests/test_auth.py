@@ -0,0 +1,86 @@
+import asyncio
+import base64
+from uuid import uuid4
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi.testclient import TestClient
+from jose import jwt
+
+import main
+import security
+
+def test_register_works_across_app_restarts():
+    # Each lifespan shuts the password hashing pool down on exit
+    for _ in range(2):
+        with TestClient(main.app) as client:
+            name = f"user-{uuid4().hex[:8]}"
+            response = client.post("/auth/register", json={"username": name, "email": f"{name}@example.com", "password": "secret"})
+            assert response.status_code == 201, response.text
+
+def signing_key(kid: str):
+    """An RSA key as a private PEM for signing tokens and a public JWK for the key set."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    numbers = private_key.public_key().public_numbers()
+
+    def b64(value: int) -> str:
+        return base64.urlsafe_b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+    return pem, {"kty": "RSA", "kid": kid, "alg": "RS256", "use": "sig", "n": b64(numbers.n), "e": b64(numbers.e)}
+
+class StubJWKS:
+    """Serves ``keys`` as the JWKS and counts the fetches; each fetch is slow enough for callers to overlap."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.fetches = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.fetches += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"keys": self.keys})
+
+def key_store(stub: StubJWKS, min_refetch_interval: int = 30):
+    store = security.JWKSKeyStore("https://auth.example.com/jwks.json", min_refetch_interval=min_refetch_interval)
+    store._client = httpx.AsyncClient(transport=httpx.MockTransport(stub.handle))
+    return store
+
+def test_concurrent_unknown_kids_share_one_refetch(monkeypatch):
+    old_pem, old_jwk = signing_key("old")
+    new_pem, new_jwk = signing_key("new")
+    stub = StubJWKS([old_jwk])
+    store = key_store(stub)
+    monkeypatch.setattr(security, "jwks_store", store)
+
+    async def verify():
+        await store.refresh()
+        # The keys were rotated after the last fetch, which is older than the minimum interval
+        stub.keys = [old_jwk, new_jwk]
+        store.fetched_at -= store.min_refetch_interval
+        tokens = [jwt.encode({"sub": f"user-{i}"}, new_pem, algorithm="RS256", headers={"kid": "new"}) for i in range(10)]
+        return await asyncio.gather(*(security.get_supabase_user_claims(token) for token in tokens))
+
+    claims = asyncio.run(verify())
+    assert [c["sub"] for c in claims] == [f"user-{i}" for i in range(10)]
+    assert stub.fetches == 2
+
+def test_unknown_kid_refetches_at_most_once_per_interval():
+    _, known_jwk = signing_key("known")
+    stub = StubJWKS([known_jwk])
+    store = key_store(stub)
+
+    async def look_up():
+        await store.refresh()
+        store.fetched_at -= store.min_refetch_interval
+        first = await store.get_key("missing")
+        fetches_after_first_miss = stub.fetches
+        second = await store.get_key("missing")
+        return first, second, fetches_after_first_miss
+
+    first, second, fetches_after_first_miss = asyncio.run(look_up())
+    assert first is None and second is None
+    assert fetches_after_first_miss == 2
+    # Inside the minimum interval a second miss doesn't fetch again
+    assert stub.fetches == 2
@@ -0,0 +1,53 @@
+import sqlalchemy as sa
+
+import authorization
+from database import engine
+
+def write_behind_cache(groupId: str, statement: str, **params):
+    """A committed group write whose cache invalidation hasn't arrived, as from another worker."""
+    with engine.begin() as connection:
+        connection.execute(sa.text(statement), {"groupId": groupId, **params})
+        connection.execute(sa.text('UPDATE groups SET "ledgerVersion" = "ledgerVersion" + 1 WHERE id = :groupId'), {"groupId": groupId})
+
+def test_removed_member_is_refused_before_the_invalidation_arrives(client, make_user, create_group, add_member, sign_in):
+    owner, member = make_user("owner"), make_user("member")
+    groupId = create_group(owner)
+    add_member(groupId, owner, member)
+    sign_in(member)
+    assert client.get(f"/groups/{groupId}").status_code == 200
+
+    write_behind_cache(groupId, 'DELETE FROM members WHERE "groupId" = :groupId AND "userId" = :userId', userId=member.id)
+    assert client.get(f"/groups/{groupId}").status_code == 403
+
+def test_load_racing_an_invalidation_is_not_served_again(client, make_user, create_group, add_member, sign_in, monkeypatch):
+    owner, member = make_user("owner"), make_user("member")
+    groupId = create_group(owner)
+    add_member(groupId, owner, member)
+    load_group_access = authorization.load_group_access
+
+    async def load_then_remove_member(loaded_groupId):
+        access = await load_group_access(loaded_groupId)
+        # The member is removed, and the entry invalidated, while this load is still returning
+        write_behind_cache(groupId, 'DELETE FROM members WHERE "groupId" = :groupId AND "userId" = :userId', userId=member.id)
+        authorization.invalidate_group_access(groupId)
+        return access
+
+    sign_in(member)
+    monkeypatch.setattr(authorization, "load_group_access", load_then_remove_member)
+    assert client.get(f"/groups/{groupId}").status_code == 200
+    monkeypatch.setattr(authorization, "load_group_access", load_group_access)
+    assert client.get(f"/groups/{groupId}").status_code == 403
+
+def test_group_etag_and_body_come_from_the_same_read(client, make_user, create_group):
+    owner = make_user("owner")
+    groupId = create_group(owner, "Before")
+    first = client.get(f"/groups/{groupId}")
+    assert first.json()["name"] == "Before"
+
+    write_behind_cache(groupId, "UPDATE groups SET name = 'After' WHERE id = :groupId")
+    second = client.get(f"/groups/{groupId}", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 200
+    assert second.json()["name"] == "After"
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+    assert client.get(f"/groups/{groupId}", headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
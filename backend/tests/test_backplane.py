@@ -0,0 +1,71 @@
+"""The cross-worker bus against a real broker on a temporary Unix socket."""
+import asyncio
+import os
+import tempfile
+
+from backplane import SharedCache, SocketMessageBus, run_broker
+from pubsub import GroupEventBus
+
+async def eventually(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+async def with_workers(check, count: int = 2):
+    url = f"unix://{os.path.join(tempfile.mkdtemp(prefix='kanak-backplane-'), 'broker.sock')}"
+    broker = asyncio.create_task(run_broker(url))
+    buses = [SocketMessageBus(url, reconnect_seconds=0.01) for _ in range(count)]
+    try:
+        for bus in buses:
+            await bus.start(timeout=2.0)
+        await check(buses)
+    finally:
+        for bus in buses:
+            await bus.stop()
+        broker.cancel()
+
+def test_cache_invalidation_reaches_the_other_worker():
+    async def check(buses):
+        first, second = (SharedCache("groups", maxsize=10, ttl=60, bus=bus) for bus in buses)
+        first["a"] = second["a"] = 1
+        first["b"] = second["b"] = 2
+        first.invalidate("a")
+        await eventually(lambda: "a" not in second)
+        assert "a" not in first and "b" in second
+
+        first.clear()
+        await eventually(lambda: "b" not in second)
+
+    asyncio.run(with_workers(check))
+
+def test_group_events_reach_the_other_worker():
+    async def check(buses):
+        publisher, receiver = (GroupEventBus(max_pending=8, bus=bus) for bus in buses)
+        subscription = receiver.subscribe("group-1", "user-1")
+        publisher.publish("group-1", "transaction", "created", "tx-1", 3)
+        batch = await subscription.next_batch(timeout=2.0, coalesce_seconds=0)
+        assert batch == [{"entity": "transaction", "action": "created", "id": "tx-1", "version": 3}]
+
+    asyncio.run(with_workers(check))
+
+def test_worker_reconnects_after_a_failing_handler():
+    async def check(buses):
+        sender, receiver = buses
+        received = []
+
+        def handle(message):
+            if message.get("fail"):
+                raise RuntimeError("handler failed")
+            received.append(message)
+
+        receiver.subscribe("test", handle)
+        resets = []
+        receiver.on_reset(lambda: resets.append(True))
+        sender.publish("test", {"fail": True})
+        # The failure drops the connection; the worker resets and connects again
+        await eventually(lambda: len(resets) >= 2 and receiver._writer is not None)
+        sender.publish("test", {"n": 1})
+        await eventually(lambda: received == [{"n": 1}])
+
+    asyncio.run(with_workers(check))
@@ -0,0 +1,106 @@
+"""Concurrent transaction writes must leave ``member_balances`` matching the ledger, in both SQLite modes."""
+import asyncio
+import random
+
+import httpx
+import pytest
+
+import database
+import main
+from ledger import find_balance_drift
+from sqlite_mode import SQLITE_READ_POOL_SIZE, SQLITE_WRITE_BATCH_SIZE, SQLiteConnectionPool, SQLiteWriter
+
+WRITERS = 16
+WRITES_PER_WRITER = 12
+
+@pytest.fixture(params=["default", "production"])
+def sqlite_mode(request, monkeypatch):
+    """Run with SQLite production mode off or on, whatever the environment says."""
+    if request.param == "production":
+        pool = SQLiteConnectionPool(database.database.url.database, SQLITE_READ_POOL_SIZE)
+        monkeypatch.setattr(database, "sqlite_pool", pool)
+        monkeypatch.setattr(database, "sqlite_writer", SQLiteWriter(database.database, pool, SQLITE_WRITE_BATCH_SIZE))
+    else:
+        monkeypatch.setattr(database, "sqlite_pool", None)
+        monkeypatch.setattr(database, "sqlite_writer", None)
+    return request.param
+
+def transaction_body(rng: random.Random, member_ids):
+    participants = rng.sample(member_ids, rng.randint(1, len(member_ids)))
+    amount = rng.randint(1, 100000)
+    body = {
+        "type": rng.choice(["DEBIT", "CREDIT"]),
+        "amount": amount / 100,
+        "description": "Stress",
+        "payerId": rng.choice(member_ids),
+    }
+    mode = rng.choice(["EQUAL", "AMOUNT", "PERCENTAGE"])
+    if mode == "EQUAL":
+        return {**body, "splitMode": mode, "participantIds": participants}
+    if mode == "AMOUNT":
+        shares = [amount // len(participants)] * len(participants)
+        shares[0] += amount - sum(shares)
+        return {**body, "splitMode": mode, "splits": [
+            {"userId": userId, "amount": share / 100} for userId, share in zip(participants, shares)
+        ]}
+    percentages = [10000 // len(participants)] * len(participants)
+    percentages[0] += 10000 - sum(percentages)
+    return {**body, "splitMode": mode, "splits": [
+        {"userId": userId, "percentage": percentage / 100} for userId, percentage in zip(participants, percentages)
+    ]}
+
+async def add_member(client, sign_in, groupId, owner, user):
+    sign_in(owner)
+    response = await client.post(f"/groups/{groupId}/members", json={"identifier": user.email, "role": "EDITOR"})
+    assert response.status_code == 200, response.text
+    sign_in(user)
+    invitation = next(i for i in (await client.get("/invitations/")).json() if i["groupId"] == groupId)
+    response = await client.post(f"/invitations/{invitation['id']}/respond", json={"accept": True})
+    assert response.status_code == 200, response.text
+    sign_in(owner)
+
+async def stress(make_user, sign_in):
+    owner = make_user("owner")
+    others = [make_user(f"member{i}") for i in range(4)]
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            sign_in(owner)
+            groupId = (await client.post("/groups/", json={"name": "Stress"})).json()["id"]
+            for user in others:
+                await add_member(client, sign_in, groupId, owner, user)
+            member_ids = [owner.id, *(user.id for user in others)]
+
+            async def writer(seed: int):
+                rng = random.Random(seed)
+                kept = []
+                for _ in range(WRITES_PER_WRITER):
+                    action = rng.random() if kept else 0
+                    if action < 0.5:
+                        response = await client.post(f"/groups/{groupId}/transactions", json=transaction_body(rng, member_ids))
+                        assert response.status_code == 201, response.text
+                        kept.append(response.json()["id"])
+                    elif action < 0.8:
+                        transactionId = rng.choice(kept)
+                        response = await client.put(f"/groups/{groupId}/transactions/{transactionId}", json=transaction_body(rng, member_ids))
+                        assert response.status_code == 200, response.text
+                    else:
+                        transactionId = kept.pop(rng.randrange(len(kept)))
+                        response = await client.delete(f"/groups/{groupId}/transactions/{transactionId}")
+                        assert response.status_code == 200, response.text
+                return len(kept)
+
+            kept = sum(await asyncio.gather(*(writer(seed) for seed in range(WRITERS))))
+            listed = (await client.get(f"/groups/{groupId}/transactions")).json()
+            balances = (await client.get(f"/groups/{groupId}/balances")).json()
+        drift = await find_balance_drift(groupId)
+    return kept, listed, balances, drift
+
+def test_concurrent_writes_keep_balances_exact(sqlite_mode, make_user, sign_in):
+    kept, listed, balances, drift = asyncio.run(stress(make_user, sign_in))
+    assert len(listed) == kept
+    assert drift == []
+    # Balances move money between members, so they always net to zero
+    assert round(sum(balance["balance"] for balance in balances), 2) == 0
+    if sqlite_mode == "production":
+        assert database.sqlite_writer.writes > 0
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import httpx
+
+import main
+from backplane import InMemoryMessageBus
+from pubsub import GroupEventBus, group_events
+from routers import events
+
+def change(id, action="updated", version=1):
+    return {"entity": "transaction", "action": action, "id": id, "version": version}
+
+def test_events_for_the_same_entity_coalesce():
+    bus = GroupEventBus(max_pending=8, bus=InMemoryMessageBus())
+    subscription = bus.subscribe("group-1", "user-1")
+    other_group = bus.subscribe("group-2", "user-1")
+    bus.publish("group-1", "transaction", "created", "tx-1", 1)
+    bus.publish("group-1", "transaction", "created", "tx-2", 2)
+    bus.publish("group-1", "transaction", "updated", "tx-1", 3)
+
+    batch = asyncio.run(subscription.next_batch(timeout=1, coalesce_seconds=0))
+    # The latest event per entity, in the order the entities last changed
+    assert batch == [change("tx-2", "created", 2), change("tx-1", "updated", 3)]
+    assert asyncio.run(other_group.next_batch(timeout=0.01, coalesce_seconds=0)) == []
+
+def test_subscriber_falling_behind_is_dropped():
+    bus = GroupEventBus(max_pending=2, bus=InMemoryMessageBus())
+    slow = bus.subscribe("group-1", "user-1")
+    for id in ("tx-1", "tx-2", "tx-3"):
+        bus.publish("group-1", "transaction", "created", id, 1)
+
+    assert slow.dropped
+    assert asyncio.run(slow.next_batch(timeout=1)) == []
+    assert bus.metrics() == {"groups": 0, "subscribers": 0, "dropped": 1}
+
+def test_overflow_sends_reset():
+    async def read():
+        bus = GroupEventBus(max_pending=1, bus=InMemoryMessageBus())
+        subscription = bus.subscribe("group-1", "user-1")
+        stream = events.stream_group_events(subscription, 5)
+        first = await stream.__anext__()
+        bus.publish("group-1", "transaction", "created", "tx-1", 6)
+        bus.publish("group-1", "transaction", "created", "tx-2", 7)
+        return [first, *[chunk async for chunk in stream]]
+
+    assert asyncio.run(read()) == ['event: ready\ndata: {"version": 5}\n\n', "event: reset\ndata: {}\n\n"]
+
+def test_disconnecting_client_unsubscribes():
+    async def connect_and_leave():
+        subscription = group_events.subscribe("group-1", "user-1")
+        stream = events.stream_group_events(subscription, 1)
+        await stream.__anext__()
+        assert group_events.metrics()["subscribers"] == 1
+        await stream.aclose()
+
+    asyncio.run(connect_and_leave())
+    assert group_events.metrics()["subscribers"] == 0
+
+def parse_sse(text: str):
+    frames = []
+    for frame in text.split("\n\n"):
+        if frame.startswith(":"):
+            frames.append(("comment", frame[1:].strip()))
+        elif frame:
+            fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+            frames.append((fields["event"], json.loads(fields["data"])))
+    return frames
+
+def test_stream_through_the_api(make_user, sign_in, monkeypatch):
+    monkeypatch.setattr(events, "EVENT_HEARTBEAT_SECONDS", 0.05)
+
+    async def stream():
+        owner = make_user("owner")
+        sign_in(owner)
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                groupId = (await client.post("/groups/", json={"name": "Live"})).json()["id"]
+                # The transport returns once the stream has ended, which deleting the group does
+                response_task = asyncio.create_task(client.get(f"/groups/{groupId}/events"))
+                while not group_events.metrics()["subscribers"]:
+                    await asyncio.sleep(0.01)
+                await asyncio.sleep(0.1)
+                transactionId = (await client.post(f"/groups/{groupId}/transactions", json={
+                    "type": "DEBIT", "amount": 10, "description": "Lunch", "payerId": owner.id,
+                    "splitMode": "EQUAL", "participantIds": [owner.id],
+                })).json()["id"]
+                await asyncio.sleep(0.1)
+                assert (await client.delete(f"/groups/{groupId}")).status_code == 204
+                response = await asyncio.wait_for(response_task, 5)
+        return response, transactionId
+
+    response, transactionId = asyncio.run(stream())
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = parse_sse(response.text)
+    assert frames[0] == ("ready", {"version": 0})
+    assert ("comment", "heartbeat") in frames
+    changes = [data for event, data in frames if event == "change"]
+    assert changes[0]["entity"] == "transaction" and changes[0]["id"] == transactionId
+    assert changes[-1]["entity"] == "group" and changes[-1]["action"] == "deleted"
+    assert group_events.metrics()["subscribers"] == 0
@@ -0,0 +1,133 @@
+"""Check that the queries the routers send are answered through the indexes from migrations/.
+
+Runs ``EXPLAIN QUERY PLAN`` on SQLite, or ``EXPLAIN`` with sequential scans
+disabled on Postgres, for the queries each request actually sent.
+"""
+import pytest
+
+import database as database_module
+from database import engine
+
+@pytest.fixture
+def recorded_queries(monkeypatch):
+    queries = []
+    for name in ("execute", "fetch_all", "fetch_one", "fetch_val"):
+        method = getattr(database_module.database, name)
+
+        def record(query, *args, _method=method, **kwargs):
+            queries.append(query)
+            return _method(query, *args, **kwargs)
+        monkeypatch.setattr(database_module.database, name, record)
+
+    iterate = database_module.database.iterate
+
+    def record_iterate(query, *args, **kwargs):
+        queries.append(query)
+        return iterate(query, *args, **kwargs)
+    monkeypatch.setattr(database_module.database, "iterate", record_iterate)
+    return queries
+
+def query_plan(query) -> str:
+    compiled = query.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    processors = compiled._bind_processors
+    params = {key: processors[key](value) if key in processors else value for key, value in compiled.construct_params().items()}
+    if compiled.positiontup is not None:
+        params = tuple(params[key] for key in compiled.positiontup)
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", params)
+        else:
+            # Tables this small would be scanned anyway; ask whether an index can answer the query at all
+            connection.exec_driver_sql("SET enable_seqscan = off")
+            rows = connection.exec_driver_sql(f"EXPLAIN {compiled.string}", params)
+        return "\n".join(str(row[-1]) for row in rows)
+
+def is_full_scan(plan_line: str) -> bool:
+    line = plan_line.strip()
+    if engine.dialect.name == "sqlite":
+        return line.startswith("SCAN ") and "USING" not in line and "CONSTANT ROW" not in line
+    return "Seq Scan" in line
+
+def plans_for(client, recorded_queries, path, table=None, method="GET", **kwargs):
+    """Plans of the queries a request sent, failing on any full table scan; only those reading ``table`` if given."""
+    recorded_queries.clear()
+    response = client.request(method, path, **kwargs)
+    assert response.status_code < 300, response.text
+    plans = {str(query): query_plan(query) for query in recorded_queries if not isinstance(query, str)}
+    for statement, plan in plans.items():
+        assert not any(is_full_scan(line) for line in plan.splitlines()), f"{method} {path} scans a table:\n{statement}\n{plan}"
+    return [plan for statement, plan in plans.items() if table is None or f"FROM {table}" in statement]
+
+@pytest.fixture
+def group(client, make_user, create_group, add_member):
+    owner, member = make_user("owner"), make_user("member")
+    groupId = create_group(owner)
+    add_member(groupId, owner, member)
+    for _ in range(3):
+        response = client.post(f"/groups/{groupId}/transactions", json={
+            "type": "DEBIT", "amount": 10, "description": "Lunch", "payerId": owner.id,
+            "splitMode": "EQUAL", "participantIds": [owner.id, member.id],
+        })
+        assert response.status_code == 201
+    return groupId, owner, member
+
+def test_transaction_pages_use_the_group_date_index(client, group, recorded_queries):
+    groupId, _, _ = group
+    first = client.get(f"/groups/{groupId}/transactions", params={"limit": 1})
+    cursor = first.headers["X-Next-Cursor"]
+    for path in (f"/groups/{groupId}/transactions?limit=1", f"/groups/{groupId}/transactions?limit=1&cursor={cursor}"):
+        plans = plans_for(client, recorded_queries, path, "transactions")
+        assert any("ix_transactions_groupId_date" in plan for plan in plans)
+
+def test_delta_sync_uses_the_change_version_index(client, group, recorded_queries):
+    groupId, _, _ = group
+    plans = plans_for(client, recorded_queries, f"/groups/{groupId}/changes?since=1", "transactions")
+    assert plans and all("ix_transactions_groupId_changeVersion" in plan for plan in plans)
+
+def test_invitation_lookups_use_invitation_indexes(client, group, recorded_queries, make_user, sign_in):
+    groupId, owner, _ = group
+    invitee = make_user("invitee")
+    assert client.post(f"/groups/{groupId}/members", json={"identifier": invitee.email, "role": "VIEWER"}).status_code == 200
+
+    plans = plans_for(client, recorded_queries, f"/groups/{groupId}/invitations", "invitations")
+    assert plans and all("ix_invitations_groupId_status" in plan for plan in plans)
+
+    sign_in(invitee)
+    plans = plans_for(client, recorded_queries, "/invitations/", "invitations")
+    assert plans and all(
+        "ix_invitations_inviteeId_status" in plan and "ix_invitations_inviteeEmail_status" in plan for plan in plans
+    )
+
+def test_active_member_lookups_use_the_member_index(client, group, recorded_queries):
+    groupId, _, _ = group
+    for path in ("/groups/", f"/groups/{groupId}/balances", f"/groups/{groupId}/settlements", f"/groups/{groupId}/statement"):
+        plans = plans_for(client, recorded_queries, path, "members")
+        assert any("ix_members_groupId_isActive" in plan for plan in plans), path
+
+def test_payer_filter_uses_the_payer_index(client, group, recorded_queries):
+    groupId, owner, _ = group
+    plans = plans_for(client, recorded_queries, f"/groups/{groupId}/transactions?payerId={owner.id}", "transactions")
+    assert any("ix_transactions_payerId_groupId_date" in plan for plan in plans)
+
+def test_no_route_scans_a_table(client, group, recorded_queries, make_user, sign_in):
+    groupId, owner, member = group
+    transactionId = client.get(f"/groups/{groupId}/transactions").json()[0]["id"]
+    body = {
+        "type": "DEBIT", "amount": 12, "description": "Dinner", "payerId": owner.id,
+        "splitMode": "EQUAL", "participantIds": [owner.id, member.id],
+    }
+    for path in (
+        "/groups/", f"/groups/{groupId}", f"/groups/{groupId}/invitations", f"/groups/{groupId}/transactions",
+        f"/groups/{groupId}/transactions/{transactionId}", f"/groups/{groupId}/balances",
+        f"/groups/{groupId}/settlements", f"/groups/{groupId}/changes?since=0", f"/groups/{groupId}/export?format=csv",
+        f"/groups/{groupId}/export?format=ndjson", f"/groups/{groupId}/statement", "/invitations/",
+    ):
+        plans_for(client, recorded_queries, path)
+
+    plans_for(client, recorded_queries, f"/groups/{groupId}/transactions", method="POST", json=body)
+    plans_for(client, recorded_queries, f"/groups/{groupId}/transactions/{transactionId}", method="PUT", json=body)
+    plans_for(client, recorded_queries, f"/groups/{groupId}/transactions/{transactionId}", method="DELETE")
+    plans_for(client, recorded_queries, f"/groups/{groupId}", method="PUT", json={"name": "Renamed"})
+    plans_for(client, recorded_queries, f"/groups/{groupId}/members", method="POST", json={"identifier": make_user("guest").email, "role": "VIEWER"})
+    plans_for(client, recorded_queries, f"/groups/{groupId}/members/{member.id}/replace-with-guest", method="PUT")
+    plans_for(client, recorded_queries, f"/groups/{groupId}", method="DELETE")
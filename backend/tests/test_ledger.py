@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import sqlalchemy as sa
+
+from database import engine
+from ledger import merge_deltas, transaction_balance_deltas
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def ledger_cli(*args):
+    return subprocess.run(
+        [sys.executable, "ledger.py", *args], cwd=BACKEND_DIR, capture_output=True, text=True, env=os.environ.copy()
+    )
+
+def stored_balances(groupId: str):
+    with engine.connect() as connection:
+        rows = connection.execute(sa.text('SELECT "userId", balance FROM member_balances WHERE "groupId" = :g'), {"g": groupId})
+        return {row.userId: row.balance for row in rows if row.balance}
+
+def balances_from_splits(groupId: str):
+    with engine.connect() as connection:
+        ledger = connection.execute(sa.text(
+            'SELECT id, type, amount, "payerId", "createdById" FROM transactions WHERE "groupId" = :g'
+        ), {"g": groupId}).mappings().all()
+        splits = connection.execute(sa.text(
+            'SELECT "transactionId", "userId", amount FROM transaction_splits'
+            ' WHERE "transactionId" IN (SELECT id FROM transactions WHERE "groupId" = :g)'
+        ), {"g": groupId}).mappings().all()
+    balances = merge_deltas(*(
+        transaction_balance_deltas(transaction, [split for split in splits if split["transactionId"] == transaction["id"]])
+        for transaction in ledger
+    ))
+    return {userId: balance for userId, balance in balances.items() if balance}
+
+def test_verify_reports_drift_and_rebuild_repairs_it(client, make_user, create_group, add_member):
+    owner, member = make_user("owner"), make_user("member")
+    groupId = create_group(owner)
+    add_member(groupId, owner, member)
+    for amount, payer in ((30, owner), (12.5, member), (7.01, owner)):
+        body = {"type": "DEBIT", "amount": amount, "description": "Groceries", "payerId": payer.id,
+                "splitMode": "EQUAL", "participantIds": [owner.id, member.id]}
+        assert client.post(f"/groups/{groupId}/transactions", json=body).status_code == 201
+    assert ledger_cli("verify", "--group", groupId).returncode == 0
+
+    expected = balances_from_splits(groupId)
+    with engine.begin() as connection:
+        connection.execute(sa.text(
+            'UPDATE member_balances SET balance = balance + 100 WHERE "groupId" = :g AND "userId" = :u'
+        ), {"g": groupId, "u": member.id})
+    assert stored_balances(groupId) != expected
+
+    verify = ledger_cli("verify", "--group", groupId)
+    assert verify.returncode == 1
+    assert f"{groupId} {member.id}:" in verify.stdout
+    assert owner.id not in verify.stdout
+    assert "1 balance rows drifted." in verify.stdout
+
+    assert ledger_cli("rebuild", "--group", groupId).returncode == 0
+    assert ledger_cli("verify", "--group", groupId).returncode == 0
+    assert stored_balances(groupId) == expected
@@ -0,0 +1,99 @@
+"""Query counts per endpoint, so a new N+1 pattern fails here instead of in production.
+
+Each request runs with its expected count as the strict query budget: one
+query more raises ``QueryBudgetExceeded``, and one fewer fails the equality
+check, which is the cue to lower the number here.
+"""
+import re
+
+import pytest
+
+import main
+import security
+from profiling import query_profiler
+
+@pytest.fixture
+def queries(client, monkeypatch):
+    monkeypatch.setattr(query_profiler, "strict", True)
+
+    def run(expected: int, method: str, path: str, **kwargs):
+        budget = query_profiler.budget
+        query_profiler.budget = expected
+        try:
+            response = client.request(method, path, **kwargs)
+        finally:
+            query_profiler.budget = budget
+        assert response.status_code < 300, response.text
+        ran = int(re.search(r'desc="(\d+) queries"', response.headers["server-timing"]).group(1))
+        assert ran == expected, f"{method} {path} ran {ran} queries, expected {expected}"
+        return response
+    return run
+
+@pytest.fixture
+def group(client, make_user, sign_in, add_member, queries):
+    owner, member, other = make_user("owner"), make_user("member"), make_user("other")
+    sign_in(owner)
+    groupId = queries(3, "POST", "/groups/", json={"name": "Flat"}).json()["id"]
+    add_member(groupId, owner, member)
+    add_member(groupId, owner, other)
+    return groupId, owner, member, other
+
+def expense(payer, *participants, amount=10):
+    return {
+        "type": "DEBIT",
+        "amount": amount,
+        "description": "Groceries",
+        "payerId": payer.id,
+        "splitMode": "EQUAL",
+        "participantIds": [payer.id, *(user.id for user in participants)],
+    }
+
+# A transaction write bumps the group's ledger version, so the next request
+# reloads the group's access with one extra query
+def test_transaction_writes(group, queries):
+    groupId, owner, member, _ = group
+    transactionId = queries(6, "POST", f"/groups/{groupId}/transactions", json=expense(owner, member)).json()["id"]
+    queries(6, "POST", f"/groups/{groupId}/transactions", json=expense(member, owner, amount=25))
+    queries(8, "PUT", f"/groups/{groupId}/transactions/{transactionId}", json=expense(owner, member, amount=12))
+    queries(7, "DELETE", f"/groups/{groupId}/transactions/{transactionId}")
+
+def test_group_writes(group, queries):
+    groupId, _, _, other = group
+    queries(3, "PUT", f"/groups/{groupId}", json={"name": "House"})
+    queries(11, "PUT", f"/groups/{groupId}/members/{other.id}/replace-with-guest")
+
+def test_reads(group, queries):
+    groupId, owner, member, _ = group
+    for amount in (10, 20, 30, 40):
+        queries(6, "POST", f"/groups/{groupId}/transactions", json=expense(owner, member, amount=amount))
+    queries(2, "GET", f"/groups/{groupId}")
+    # Served from the group access cache from here on; a larger ledger must not add queries
+    queries(1, "GET", f"/groups/{groupId}")
+    for path, expected in [
+        ("/groups/", 2),
+        (f"/groups/{groupId}/transactions", 3),
+        (f"/groups/{groupId}/balances", 2),
+        (f"/groups/{groupId}/settlements", 2),
+        (f"/groups/{groupId}/changes?since=0", 5),
+    ]:
+        queries(expected, "GET", path)
+
+def test_metrics_need_the_metrics_token(client, monkeypatch):
+    paths = ["/metrics", "/metrics/password-hashing", "/metrics/events", "/metrics/database", "/metrics/queries"]
+    monkeypatch.setattr(main, "QUERY_METRICS_ENABLED", True)
+    # Unset, the endpoints are off
+    assert [client.get(path).status_code for path in paths] == [404] * len(paths)
+
+    monkeypatch.setattr(security, "METRICS_TOKEN", "scraper-secret")
+    assert [client.get(path).status_code for path in paths] == [401] * len(paths)
+    wrong = {"Authorization": "Bearer guessed"}
+    assert [client.get(path, headers=wrong).status_code for path in paths] == [401] * len(paths)
+    right = {"Authorization": "Bearer scraper-secret"}
+    assert [client.get(path, headers=right).status_code for path in paths] == [200] * len(paths)
+
+def test_query_metrics_are_off_by_default(client, monkeypatch):
+    monkeypatch.setattr(security, "METRICS_TOKEN", "scraper-secret")
+    headers = {"Authorization": "Bearer scraper-secret"}
+    assert client.get("/metrics/queries", headers=headers).status_code == 404
+    monkeypatch.setattr(main, "QUERY_METRICS_ENABLED", True)
+    assert "slowestStatements" in client.get("/metrics/queries", headers=headers).json()
@@ -0,0 +1,82 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import httpx
+
+import main
+from database import database
+from models import transactions
+from routers import statements
+from routers.statements import StatementRenderer, build_statement
+
+async def statement_rows(make_user, sign_in):
+    owner = make_user("owner")
+    new_york = ZoneInfo("America/New_York")
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            sign_in(owner)
+            groupId = (await client.post("/groups/", json={"name": "Trip"})).json()["id"]
+            body = {"type": "DEBIT", "amount": 10, "description": "Late dinner", "payerId": owner.id,
+                    "splitMode": "EQUAL", "participantIds": [owner.id]}
+            assert (await client.post(f"/groups/{groupId}/transactions", json=body)).status_code == 201
+            # 03:30 UTC on New Year's Day is still New Year's Eve in New York
+            await database.execute(
+                transactions.update().where(transactions.c.groupId == groupId).values(date=datetime(2024, 1, 1, 3, 30))
+            )
+
+            unknown = await client.get(f"/groups/{groupId}/statement", params={"tz": "Nowhere/Special"})
+            local = await client.get(f"/groups/{groupId}/statement", params={"tz": "America/New_York"})
+
+        utc = await build_statement(groupId, "Trip", None, None, ZoneInfo("UTC"))
+        eve = await build_statement(groupId, "Trip", date(2023, 12, 31), date(2023, 12, 31), new_york)
+        new_year = await build_statement(groupId, "Trip", date(2024, 1, 1), None, new_york)
+    return unknown, local, utc, eve, new_year
+
+def test_statement_dates_follow_the_requested_time_zone(make_user, sign_in):
+    unknown, local, utc, eve, new_year = asyncio.run(statement_rows(make_user, sign_in))
+
+    assert unknown.status_code == 400
+    assert local.status_code == 200
+    assert local.headers["content-type"] == "application/pdf"
+
+    assert utc["timeZone"] == "UTC"
+    assert utc["rows"][0][:2] == ["01/01/2024", "3:30 AM"]
+    assert eve["timeZone"] == "America/New_York"
+    assert [row[:3] for row in eve["rows"]] == [["12/31/2023", "10:30 PM", "Late dinner"]]
+    assert new_year["rows"] == []
+
+def test_late_render_keeps_the_newer_version_cached(monkeypatch):
+    monkeypatch.setattr(statements, "render_statement_pdf", lambda statement: statement["pdf"])
+    renderer = StatementRenderer(workers=1, cache_size=8)
+    renderer._executor = ThreadPoolExecutor(max_workers=2)
+
+    async def render_out_of_order():
+        release_old = asyncio.Event()
+
+        async def build_old():
+            await release_old.wait()
+            return {"pdf": b"v1"}
+
+        async def build_new():
+            return {"pdf": b"v2"}
+
+        old = asyncio.create_task(renderer.render(("group", 1), build_old))
+        await asyncio.sleep(0)
+        assert await renderer.render(("group", 2), build_new) == b"v2"
+        # The version 1 render finishes only after version 2 was stored
+        release_old.set()
+        assert await old == b"v1"
+        assert renderer._cache.get(("group", 2)) == b"v2"
+
+        async def build_newest():
+            return {"pdf": b"v3"}
+
+        await renderer.render(("group", 3), build_newest)
+        return list(renderer._cache.keys())
+
+    try:
+        assert asyncio.run(render_out_of_order()) == [("group", 3)]
+    finally:
+        renderer.shutdown()
@@ -0,0 +1,149 @@
+import json
+
+import sqlalchemy as sa
+
+from database import engine
+
+def expense(payer, amount=10, **fields):
+    return {"type": "DEBIT", "amount": amount, "description": "Lunch", "payerId": payer.id,
+            "splitMode": "EQUAL", "participantIds": [payer.id], **fields}
+
+def test_pages_cover_rows_sharing_a_date(client, make_user, create_group):
+    owner = make_user("owner")
+    groupId = create_group(owner)
+    for _ in range(5):
+        assert client.post(f"/groups/{groupId}/transactions", json=expense(owner)).status_code == 201
+    # Give every row the date exactly as the API stored the first one, so only ids tell them apart
+    with engine.begin() as connection:
+        connection.execute(sa.text(
+            'UPDATE transactions SET date = (SELECT min(date) FROM transactions WHERE "groupId" = :g) WHERE "groupId" = :g'
+        ), {"g": groupId})
+
+    unpaged = [t["id"] for t in client.get(f"/groups/{groupId}/transactions").json()]
+    paged, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/groups/{groupId}/transactions", params=params)
+        paged += [t["id"] for t in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert len(unpaged) == 5
+    assert paged == unpaged
+
+    date = client.get(f"/groups/{groupId}/transactions/{unpaged[0]}").json()["date"]
+    bounded = client.get(f"/groups/{groupId}/transactions", params={"from": date, "to": date})
+    assert len(bounded.json()) == 5
+
+def test_legacy_dates_are_normalized_by_migration(client, make_user, create_group):
+    from alembic import command
+    from alembic.config import Config
+
+    owner = make_user("owner")
+    groupId = create_group(owner)
+    for _ in range(3):
+        client.post(f"/groups/{groupId}/transactions", json=expense(owner))
+    # As written by the CURRENT_TIMESTAMP default, without fractional seconds
+    with engine.begin() as connection:
+        connection.execute(sa.text("UPDATE transactions SET date = '2026-03-01 12:30:00' WHERE \"groupId\" = :g"), {"g": groupId})
+    config = Config("alembic.ini")
+    config.attributes["configure_logger"] = False
+    command.downgrade(config, "0005")
+    command.upgrade(config, "head")
+
+    first = client.get(f"/groups/{groupId}/transactions", params={"limit": 1})
+    rest = client.get(f"/groups/{groupId}/transactions", params={"cursor": first.headers["X-Next-Cursor"]})
+    assert len(first.json()) + len(rest.json()) == 3
+
+def chunked(body: bytes, size: int = 7):
+    # Small pieces, so records and multi-byte characters straddle chunk boundaries
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+def test_export_can_be_imported_again(client, make_user, create_group, add_member):
+    owner, member = make_user("owner"), make_user("member")
+    groupId = create_group(owner)
+    add_member(groupId, owner, member)
+    description = 'Dinner, "the usual"\nline two\r\ncafé ☕'
+    client.post(f"/groups/{groupId}/transactions", json={
+        "type": "DEBIT", "amount": 10, "description": description, "payerId": owner.id,
+        "splitMode": "AMOUNT", "splits": [{"userId": owner.id, "amount": 3.33}, {"userId": member.id, "amount": 6.67}],
+    })
+
+    # Each import doubles the ledger
+    for export_format, content_type, count in (("csv", "text/csv", 1), ("ndjson", "application/x-ndjson", 2)):
+        exported = client.get(f"/groups/{groupId}/export", params={"format": export_format}).content
+        result = client.post(f"/groups/{groupId}/transactions/import", content=chunked(exported), headers={"content-type": content_type})
+        assert result.json() == {"imported": count, "failed": 0, "errors": []}
+
+    imported = client.get(f"/groups/{groupId}/transactions").json()
+    assert [t["description"] for t in imported] == [description] * 4
+    assert all(sorted(s["amount"] for s in t["splits"]) == [3.33, 6.67] for t in imported)
+
+def test_import_reports_an_unterminated_quoted_field(client, make_user, create_group):
+    owner = make_user("owner")
+    groupId = create_group(owner)
+    body = f'type,amount,description,payerId,splitMode,splits\nDEBIT,5,"open,{owner.id},EQUAL,{owner.id}\n'
+    result = client.post(f"/groups/{groupId}/transactions/import", content=body, headers={"content-type": "text/csv"}).json()
+    assert result["imported"] == 0 and result["failed"] == 1
+
+def test_import_refuses_removed_members(client, make_user, create_group, add_member):
+    owner, member = make_user("owner"), make_user("member")
+    groupId = create_group(owner)
+    add_member(groupId, owner, member)
+    with engine.begin() as connection:
+        connection.execute(sa.text('UPDATE members SET "isActive" = false WHERE "groupId" = :g AND "userId" = :u'), {"g": groupId, "u": member.id})
+        connection.execute(sa.text('UPDATE groups SET "ledgerVersion" = "ledgerVersion" + 1 WHERE id = :g'), {"g": groupId})
+
+    body = (
+        "type,amount,description,payerId,splitMode,splits\n"
+        f"DEBIT,5,Lunch,{owner.id},EQUAL,{owner.id}\n"
+        f"DEBIT,5,Lunch,{member.id},EQUAL,{owner.id}\n"
+        f"DEBIT,5,Lunch,{owner.id},EQUAL,{owner.id};{member.id}\n"
+    )
+    result = client.post(f"/groups/{groupId}/transactions/import", content=body, headers={"content-type": "text/csv"}).json()
+    assert result["imported"] == 1 and result["failed"] == 2
+    assert [error["row"] for error in result["errors"]] == [2, 3]
+    assert all(member.id in error["detail"] for error in result["errors"])
+
+def test_non_finite_numbers_are_rejected(client, make_user, create_group):
+    owner = make_user("owner")
+    groupId = create_group(owner)
+    transactionId = client.post(f"/groups/{groupId}/transactions", json=expense(owner)).json()["id"]
+    # Python's json writes NaN and Infinity as bare literals, which the request parser accepts
+    for body in (
+        expense(owner, amount=float("nan")),
+        expense(owner, amount=float("inf")),
+        expense(owner, splitMode="AMOUNT", participantIds=None, splits=[{"userId": owner.id, "amount": float("nan")}]),
+        expense(owner, splitMode="PERCENTAGE", participantIds=None, splits=[{"userId": owner.id, "percentage": float("-inf")}]),
+    ):
+        content = json.dumps(body)
+        headers = {"content-type": "application/json"}
+        assert client.post(f"/groups/{groupId}/transactions", content=content, headers=headers).status_code == 422
+        assert client.put(f"/groups/{groupId}/transactions/{transactionId}", content=content, headers=headers).status_code == 422
+
+    body = (
+        "type,amount,description,payerId,splitMode,splits\n"
+        f"DEBIT,nan,Lunch,{owner.id},EQUAL,{owner.id}\n"
+        f"DEBIT,5,Lunch,{owner.id},AMOUNT,{owner.id}:inf\n"
+        f"DEBIT,5,Lunch,{owner.id},PERCENTAGE,{owner.id}::Infinity\n"
+        f"DEBIT,5,Lunch,{owner.id},EQUAL,{owner.id}\n"
+    )
+    result = client.post(f"/groups/{groupId}/transactions/import", content=body, headers={"content-type": "text/csv"}).json()
+    assert result["imported"] == 1
+    assert [error["row"] for error in result["errors"]] == [1, 2, 3]
+
+def test_amounts_must_fit_the_money_columns(client, make_user, create_group):
+    owner = make_user("owner")
+    groupId = create_group(owner)
+    assert client.post(f"/groups/{groupId}/transactions", json=expense(owner, amount=1e15)).status_code == 201
+    for body in (
+        expense(owner, amount=1e17),
+        expense(owner, amount=1e20),
+        expense(owner, amount=0),
+        expense(owner, amount=-5),
+        expense(owner, splitMode="AMOUNT", participantIds=None, splits=[{"userId": owner.id, "amount": 1e20}]),
+        expense(owner, splitMode="PERCENTAGE", participantIds=None, splits=[{"userId": owner.id, "percentage": 1e20}]),
+    ):
+        assert client.post(f"/groups/{groupId}/transactions", json=body).status_code == 422
@@ -1,8 +1,7 @@
 import React, { useState, useEffect, useCallback, useMemo } from 'react';
 import { User, Group, Transaction, UserRole, TransactionType, Invitation } from '../types';
-import api from '../services/api';
+import api, { fetchAllPages } from '../services/api';
 import { ArrowLeft, Plus, Users, FileDown, Trash2, Pencil, LogOut } from 'lucide-react';
-import { generateGroupPDF } from '../utils/pdfGenerator';
 import { TransactionList } from './group/TransactionList';
 import { MemberList } from './group/MemberList';
 import { TransactionModal } from './group/TransactionModal';
@@ -39,13 +38,13 @@ export const GroupDetail: React.FC<GroupDetailProps> = ({ user, groupId, onBack
     setLoading(true);
     setError('');
     try {
-      const [groupRes, transactionsRes, invitesRes] = await Promise.all([
+      const [groupRes, groupTransactions, invitesRes] = await Promise.all([
         api.get(`/groups/${groupId}`),
-        api.get(`/groups/${groupId}/transactions`),
+        fetchAllPages<Transaction>(`/groups/${groupId}/transactions`, { limit: 500 }),
         api.get(`/groups/${groupId}/invitations`),
       ]);
       setGroup(groupRes.data);
-      setTransactions(transactionsRes.data);
+      setTransactions(groupTransactions);
       setPendingInvites(invitesRes.data);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to load group data.');
@@ -59,6 +58,7 @@ export const GroupDetail: React.FC<GroupDetailProps> = ({ user, groupId, onBack
   }, [loadData]);
 
   const calculateMemberStats = (memberId: string) => {
+    // Sum in integer cents, like the server does, so totals don't pick up float noise
     let paid = 0;
     let received = 0;
     let balance = 0;
@@ -67,8 +67,8 @@ export const GroupDetail: React.FC<GroupDetailProps> = ({ user, groupId, onBack
       const payer = tx.payerId || tx.createdById;
       const isPayer = payer === memberId;
       const mySplit = tx.splits.find(s => s.userId === memberId)?.amount || 0;
-      const amount = Number(tx.amount);
-      const splitAmount = Number(mySplit);
+      const amount = Math.round(Number(tx.amount) * 100);
+      const splitAmount = Math.round(Number(mySplit) * 100);
 
       if (tx.type === TransactionType.CREDIT) {
         if (isPayer) {
@@ -90,7 +90,7 @@ export const GroupDetail: React.FC<GroupDetailProps> = ({ user, groupId, onBack
       }
     });
 
-    return { paid, received, balance };
+    return { paid: paid / 100, received: received / 100, balance: balance / 100 };
   };
 
   const currentUserRole = useMemo(() => {
@@ -132,10 +132,13 @@ export const GroupDetail: React.FC<GroupDetailProps> = ({ user, groupId, onBack
     setShowDeleteGroupConfirm(false);
   };
 
-  const handleTxSuccess = () => {
+  // Show the saved transaction as the server returned it; its EQUAL and PERCENTAGE amounts are computed there
+  const handleTxSuccess = (saved: Transaction) => {
     setShowAddTx(false);
     setEditingTx(null);
-    loadData();
+    // Kept in the server's order, oldest first
+    setTransactions(prev => [...prev.filter(tx => tx.id !== saved.id), saved]
+      .sort((a, b) => new Date(a.date).getTime() - new Date(b.date).getTime() || a.id.localeCompare(b.id)));
   };
 
   const handleMemberAdded = () => {
@@ -176,10 +179,34 @@ export const GroupDetail: React.FC<GroupDetailProps> = ({ user, groupId, onBack
     setShowLeaveGroupConfirm(false);
   };
 
-  const handleExport = (from: string, to: string) => {
-    if (group) {
-      generateGroupPDF(group, transactions, from, to);
+  const handleExport = async (from: string, to: string) => {
+    if (!group) return;
+    try {
+      // The statement is rendered and cached by the backend
+      const response = await api.get(`/groups/${groupId}/statement`, {
+        params: {
+          ...(from ? { from } : {}),
+          ...(to ? { to } : {}),
+          tz: Intl.DateTimeFormat().resolvedOptions().timeZone,
+        },
+        responseType: 'blob',
+      });
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `${group.name.replace(/\s+/g, '_')}_ledger.pdf`;
+      link.click();
+      URL.revokeObjectURL(url);
       setShowExportModal(false);
+    } catch (err: any) {
+      // With responseType 'blob' the error body is a Blob too
+      let detail: string | undefined;
+      try {
+        detail = JSON.parse(await err.response?.data?.text())?.detail;
+      } catch {
+        detail = undefined;
+      }
+      alert(detail || 'Failed to download statement.');
     }
   };
 
@@ -1,12 +1,23 @@
 import React, { useState, useEffect } from 'react';
-import { User, Group, Transaction, TransactionType, SplitMode, TransactionSplit } from '../../types';
+import { User, Group, Transaction, TransactionType, SplitMode, TransactionSplitInput } from '../../types';
 import api from '../../services/api';
 import { X, Check } from 'lucide-react';
 
+// Whole hundredths, rounded half up like the server: cents for amounts, hundredths of a percent for percentages
+const toHundredths = (value: string) => Math.round(Number((parseFloat(value) * 100).toFixed(6)));
+
+// Splits a total in hundredths into shares that differ by at most one, the leftover going to the first shares
+const spreadHundredths = (total: number, count: number): string[] => {
+  const base = Math.floor(total / count);
+  const remainder = total - base * count;
+  return Array.from({ length: count }, (_, idx) => ((base + (idx < remainder ? 1 : 0)) / 100).toFixed(2));
+};
+
 interface TransactionModalProps {
   isOpen: boolean;
   onClose: () => void;
-  onSuccess: () => void;
+  // Gets the transaction as the server saved it, with the split amounts it computed
+  onSuccess: (transaction: Transaction) => void;
   user: User;
   group: Group;
   editingTransaction?: Transaction | null;
@@ -113,18 +124,14 @@ export const TransactionModal: React.FC<TransactionModalProps> = ({
       }
     }
 
-    const amount = parseFloat(txAmount);
+    // Compared exactly in hundredths, as the server does
+    const amount = toHundredths(txAmount);
     if (!isNaN(amount) && involvedIds.length > 0) {
-      if (splitMode === SplitMode.PERCENTAGE) {
-        const currentTotal = involvedIds.reduce((sum, id) => sum + parseFloat(splitValues[id] || '0'), 0);
-        if (Math.abs(currentTotal - 100) > 0.1) {
-          errors.push("Percentage does not tally");
-        }
-      } else if (splitMode === SplitMode.AMOUNT) {
-        const currentTotal = involvedIds.reduce((sum, id) => sum + parseFloat(splitValues[id] || '0'), 0);
-        if (Math.abs(currentTotal - amount) > 0.01) {
-          errors.push("Amount does not tally");
-        }
+      const currentTotal = involvedIds.reduce((sum, id) => sum + toHundredths(splitValues[id] || '0'), 0);
+      if (splitMode === SplitMode.PERCENTAGE && currentTotal !== 100 * 100) {
+        errors.push("Percentage does not tally");
+      } else if (splitMode === SplitMode.AMOUNT && currentTotal !== amount) {
+        errors.push("Amount does not tally");
       }
     }
 
@@ -152,38 +159,14 @@ export const TransactionModal: React.FC<TransactionModalProps> = ({
       return;
     }
 
-    const newValues: Record<string, string> = {};
+    const total = mode === SplitMode.PERCENTAGE ? 100 * 100 : toHundredths(txAmount);
+    if (isNaN(total)) return;
 
-    if (mode === SplitMode.PERCENTAGE) {
-      const share = 100 / count;
-      let currentSum = 0;
-      involvedIds.forEach((id, idx) => {
-        if (idx === count - 1) {
-          newValues[id] = (100 - currentSum).toFixed(2);
-        } else {
-          const fixed = share.toFixed(2);
-          const val = parseFloat(fixed);
-          newValues[id] = fixed;
-          currentSum += val;
-        }
-      });
-    } else if (mode === SplitMode.AMOUNT) {
-      const total = parseFloat(txAmount);
-      if (isNaN(total)) return;
-
-      const share = total / count;
-      let currentSum = 0;
-      involvedIds.forEach((id, idx) => {
-        if (idx === count - 1) {
-          newValues[id] = (total - currentSum).toFixed(2);
-        } else {
-          const fixed = share.toFixed(2);
-          const val = parseFloat(fixed);
-          newValues[id] = fixed;
-          currentSum += val;
-        }
-      });
-    }
+    const shares = spreadHundredths(total, count);
+    const newValues: Record<string, string> = {};
+    involvedIds.forEach((id, idx) => {
+      newValues[id] = shares[idx];
+    });
     setSplitValues(newValues);
   };
 
@@ -208,26 +191,16 @@ export const TransactionModal: React.FC<TransactionModalProps> = ({
     }
 
     let totalTarget = 0;
-    if (splitMode === SplitMode.PERCENTAGE) totalTarget = 100;
-    else if (splitMode === SplitMode.AMOUNT) totalTarget = parseFloat(txAmount) || 0;
+    if (splitMode === SplitMode.PERCENTAGE) totalTarget = 100 * 100;
+    else if (splitMode === SplitMode.AMOUNT) totalTarget = toHundredths(txAmount) || 0;
     else {
       setSplitValues(updatedValues);
       return;
     }
 
-    const remaining = totalTarget - val;
-    const count = otherIds.length;
-    const share = remaining / count;
-
-    let allocated = 0;
+    const shares = spreadHundredths(totalTarget - toHundredths(newValue), otherIds.length);
     otherIds.forEach((id, idx) => {
-      if (idx === count - 1) {
-        updatedValues[id] = (remaining - allocated).toFixed(2);
-      } else {
-        const s = parseFloat(share.toFixed(2));
-        updatedValues[id] = s.toFixed(2);
-        allocated += s;
-      }
+      updatedValues[id] = shares[idx];
     });
 
     setSplitValues(updatedValues);
@@ -241,38 +214,17 @@ export const TransactionModal: React.FC<TransactionModalProps> = ({
     );
   };
 
-  const getFinalSplits = (totalAmount: number): TransactionSplit[] => {
+  // The server computes EQUAL and PERCENTAGE amounts, so only send who takes part and the percentages
+  const getSplitPayload = (): { participantIds?: string[]; splits?: TransactionSplitInput[] } => {
     const involvedIds = [...selectedOtherMembers];
     if (includeMyself) involvedIds.push(user.id);
 
-    if (involvedIds.length === 0) return [];
-
-    let splits: TransactionSplit[] = [];
-
     if (splitMode === SplitMode.EQUAL) {
-      const share = totalAmount / involvedIds.length;
-      splits = involvedIds.map(id => ({ userId: id, amount: parseFloat(share.toFixed(2)) }));
-      const sum = splits.reduce((acc, curr) => acc + curr.amount, 0);
-      const diff = totalAmount - sum;
-      if (splits.length > 0 && Math.abs(diff) > 0.001) {
-        splits[0].amount += diff;
-      }
+      return { participantIds: involvedIds };
     } else if (splitMode === SplitMode.PERCENTAGE) {
-      splits = involvedIds.map(id => {
-        const val = parseFloat(splitValues[id] || '0');
-        return {
-          userId: id,
-          amount: (val / 100) * totalAmount,
-          percentage: val
-        };
-      });
-    } else if (splitMode === SplitMode.AMOUNT) {
-      splits = involvedIds.map(id => {
-        const val = parseFloat(splitValues[id] || '0');
-        return { userId: id, amount: val, percentage: 0 };
-      });
+      return { splits: involvedIds.map(id => ({ userId: id, percentage: parseFloat(splitValues[id] || '0') })) };
     }
-    return splits;
+    return { splits: involvedIds.map(id => ({ userId: id, amount: parseFloat(splitValues[id] || '0') })) };
   };
 
   const handleSubmit = async (e: React.FormEvent) => {
@@ -282,7 +234,6 @@ export const TransactionModal: React.FC<TransactionModalProps> = ({
     setLoading(true);
 
     const amount = parseFloat(txAmount);
-    const splits = getFinalSplits(amount);
 
     try {
       const transactionData: any = {
@@ -292,18 +243,19 @@ export const TransactionModal: React.FC<TransactionModalProps> = ({
         category: txCategory || 'Other',
         payerId: payerId,
         splitMode,
-        splits
+        ...getSplitPayload()
       };
 
+      let response;
       if (editingTransaction) {
         if(txDate) {
           transactionData.date = new Date(txDate).toISOString();
         }
-        await api.put(`/groups/${group.id}/transactions/${editingTransaction.id}`, transactionData);
+        response = await api.put(`/groups/${group.id}/transactions/${editingTransaction.id}`, transactionData);
       } else {
-        await api.post(`/groups/${group.id}/transactions/`, transactionData);
+        response = await api.post(`/groups/${group.id}/transactions/`, transactionData);
       }
-      onSuccess();
+      onSuccess(response.data);
     } catch (err: any) {
       alert(err.response?.data?.detail || 'Failed to save transaction.');
     } finally {
@@ -73,4 +73,16 @@ api.interceptors.response.use(
   }
 );
 
+// Follows the X-Next-Cursor header of a paginated list endpoint and returns every page concatenated
+export const fetchAllPages = async <T>(url: string, params: Record<string, any> = {}): Promise<T[]> => {
+  const items: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const response = await api.get<T[]>(url, { params: { ...params, ...(cursor ? { cursor } : {}) } });
+    items.push(...response.data);
+    cursor = response.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+};
+
 export default api;
@@ -56,6 +56,13 @@ export interface TransactionSplit {
   percentage?: number; // Optional, used for UI/calculation
 }
 
+// Split as sent to the server: amount only for AMOUNT splits, percentage only for PERCENTAGE splits
+export interface TransactionSplitInput {
+  userId: string;
+  amount?: number;
+  percentage?: number;
+}
+
 export interface Transaction {
   id: string;
   groupId: string;
@@ -79,6 +86,10 @@ export interface Group {
   members: Member[];
   createdAt: string;
   createdBy: string;
+  // Only present when groups are listed with ?summary=true
+  memberCount?: number;
+  transactionCount?: number;
+  lastActivity?: string | null;
 }
 
 export interface AuthState {